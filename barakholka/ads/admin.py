@@ -1,5 +1,5 @@
 from django.contrib import admin
-from ads.models import Ads, AdsImage, Favorite, SiteStatistics
+from ads.models import Ads, AdsImage, Category, DailyStatistics, Favorite, Job, SiteStatistics
 
 @admin.register(Ads)
 class AdsAdmin(admin.ModelAdmin):
@@ -9,6 +9,17 @@ class AdsAdmin(admin.ModelAdmin):
 
     inlines = [AdsImageAdmin]
 
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ['name', 'active_ads_count']
+    search_fields = ['name']
+    readonly_fields = ['key', 'active_ads_count']
+
+    def save_model(self, request, obj, form, change):
+        obj.name = Category.clean_name(obj.name)
+        obj.key = Category.make_key(obj.name)
+        super().save_model(request, obj, form, change)
+
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ['user', 'ads', 'created_at']
@@ -16,6 +27,12 @@ class FavoriteAdmin(admin.ModelAdmin):
     search_fields = ['user__username', 'ads__title']
     readonly_fields = ['created_at']
 
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'status', 'attempts', 'duration_ms', 'run_at', 'finished_at']
+    list_filter = ['status', 'name']
+    readonly_fields = ['locked_at', 'finished_at', 'duration_ms', 'last_error', 'created_at']
+
 @admin.register(SiteStatistics)
 class SiteStatisticsAdmin(admin.ModelAdmin):
     list_display = ['total_ads', 'active_ads', 'total_users', 'total_chats', 'total_messages', 'updated_at']
@@ -27,4 +44,14 @@ class SiteStatisticsAdmin(admin.ModelAdmin):
 
     def has_delete_permission(self, request, obj=None):
         # Запрещаем удалять статистику
-        return False
\ No newline at end of file
+        return False
+
+@admin.register(DailyStatistics)
+class DailyStatisticsAdmin(admin.ModelAdmin):
+    list_display = ['date', 'new_ads', 'new_users', 'new_messages', 'new_favorites', 'updated_at']
+    date_hierarchy = 'date'
+    readonly_fields = ['date', 'new_ads', 'new_users', 'new_messages', 'new_favorites', 'updated_at']
+
+    def has_add_permission(self, request):
+        # Снимки строит только rollup_statistics
+        return False
@@ -0,0 +1,160 @@
+import json
+
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from ads.facets import apply_filters, parse_filters
+from ads.models import Ads, AdsImage
+from ads.pagination import KeysetPaginator
+from ads.search import search_ads
+
+
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 5000
+API_CHUNK_SIZE = 500
+
+# Имя поля в ответе -> выражение для .values()
+API_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'description': 'description',
+    'price': 'price',
+    'address': 'address',
+    'type': 'type',
+    'available': 'available',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+    'category': 'category__name',
+    'seller': 'seller__username',
+    'main_image': 'card_image_path',
+    'favorites_count': 'favorites_count',
+    'views_count': 'views_count',
+}
+API_DEFAULT_FIELDS = ['id', 'title', 'price', 'category', 'created_at', 'main_image']
+
+
+def _parse_fields(value):
+    if not value:
+        return API_DEFAULT_FIELDS
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in API_FIELDS]
+    if unknown:
+        raise ValueError(f"Неизвестные поля: {', '.join(unknown)}")
+    return fields
+
+
+def _parse_limit(value):
+    if not value:
+        return API_PAGE_SIZE
+    limit = int(value)
+    if not 1 <= limit <= API_MAX_PAGE_SIZE:
+        raise ValueError(f'limit должен быть от 1 до {API_MAX_PAGE_SIZE}')
+    return limit
+
+
+def _select(queryset, fields, extra=()):
+    """Выбирает из БД только запрошенные столбцы."""
+    if 'main_image' in fields:
+        queryset = queryset.with_main_image()
+    return queryset.values(*({API_FIELDS[field] for field in fields} | set(extra)))
+
+
+def _serialize(row, fields):
+    item = {field: row[API_FIELDS[field]] for field in fields}
+    if item.get('main_image'):
+        item['main_image'] = AdsImage._meta.get_field('image').storage.url(item['main_image'])
+    return item
+
+
+def _dumps(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def _page_end(paginator, last_row, has_more):
+    next_cursor = paginator.row_cursor(last_row) if has_more else None
+    return '], "next": ' + _dumps(next_cursor) + '}'
+
+
+def _stream_page(rows, fields, paginator, limit):
+    """
+    Отдаёт {"results": [...], "next": курсор} по мере чтения строк.
+    Выборка содержит limit + 1 строку: лишняя означает, что есть следующая страница.
+    """
+    yield '{"results": ['
+    last_row = None
+    has_more = False
+    for index, row in enumerate(rows):
+        if index == limit:
+            has_more = True
+            break
+        if index:
+            yield ','
+        yield _dumps(_serialize(row, fields))
+        last_row = row
+    yield _page_end(paginator, last_row, has_more)
+
+
+async def _astream_page(rows, fields, paginator, limit):
+    """
+    То же для ASGI. Синхронный итератор ASGI-обработчик Django сначала собирает
+    в список целиком, и страница оказалась бы в памяти; асинхронный он отдаёт
+    по частям, а .aiterator() читает строки пачками по API_CHUNK_SIZE.
+    """
+    yield '{"results": ['
+    last_row = None
+    has_more = False
+    index = 0
+    async for row in rows:
+        if index == limit:
+            has_more = True
+            break
+        if index:
+            yield ','
+        yield _dumps(_serialize(row, fields))
+        last_row = row
+        index += 1
+    yield _page_end(paginator, last_row, has_more)
+
+
+@require_GET
+def api_ads_list(request):
+    """Каталог объявлений в JSON: поиск (q), фильтры, курсор (after), выбор полей (fields)."""
+    try:
+        fields = _parse_fields(request.GET.get('fields'))
+        limit = _parse_limit(request.GET.get('limit'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    queryset = Ads.objects.filter(available=True)
+    search_query = request.GET.get('q', '').strip()
+    if search_query:
+        queryset = search_ads(queryset, search_query)
+        ordering = ('-rank', '-id')
+    else:
+        ordering = ('-created_at', '-id')
+    queryset = apply_filters(queryset, parse_filters(request.GET))
+
+    paginator = KeysetPaginator(queryset, limit, ordering=ordering)
+    key_fields = [field.lstrip('-') for field in ordering]
+    rows = _select(paginator.queryset_after(request.GET.get('after')), fields, key_fields)[:limit + 1]
+
+    if isinstance(request, ASGIRequest):
+        stream = _astream_page(rows.aiterator(chunk_size=API_CHUNK_SIZE), fields, paginator, limit)
+    else:
+        stream = _stream_page(rows.iterator(chunk_size=API_CHUNK_SIZE), fields, paginator, limit)
+    return StreamingHttpResponse(stream, content_type='application/json')
+
+
+@require_GET
+def api_ads_detail(request, ad_id):
+    try:
+        fields = _parse_fields(request.GET.get('fields'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    row = _select(Ads.objects.filter(pk=ad_id), fields).first()
+    if row is None:
+        return JsonResponse({'error': 'Объявление не найдено'}, status=404)
+    return JsonResponse(_serialize(row, fields), json_dumps_params={'ensure_ascii': False})
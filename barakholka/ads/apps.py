@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class AdsConfig(AppConfig):
     name = 'ads'
+
+    def ready(self):
+        from ads import signals  # noqa: F401
+        from ads import tasks  # noqa: F401
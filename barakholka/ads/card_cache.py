@@ -0,0 +1,72 @@
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+CARD_TEMPLATE = 'ads/ad_card.html'
+# Увеличивается при изменении шаблона карточки, чтобы не отдавать HTML старой разметки
+CARD_TEMPLATE_VERSION = 2
+
+CARD_HITS_KEY = 'ads:card:hits'
+CARD_MISSES_KEY = 'ads:card:misses'
+
+
+def _card_key(ad_id, version):
+    return f'ads:card:v{CARD_TEMPLATE_VERSION}:{ad_id}:{version}'
+
+
+def updated_at_version(updated_at):
+    """
+    Версия объявления для ключей кэша карточки и страницы — время его изменения.
+    Она хранится в БД и поэтому одинакова во всех процессах, в отличие от
+    версии в локальном кэше процесса: правку, сделанную в другом воркере
+    или в run_jobs, видно сразу.
+    """
+    return int(updated_at.timestamp() * 1_000_000)
+
+
+def _count(key, delta):
+    if not delta:
+        return
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key, delta)
+
+
+def render_cards(ads):
+    """
+    Собирает HTML карточек страницы: готовые карточки читаются одним
+    обращением к кэшу, отрисовываются только промахи. Ключ содержит
+    updated_at, поэтому любое изменение объявления даёт новый ключ.
+    """
+    ads = list(ads)
+    keys = {ad.pk: _card_key(ad.pk, updated_at_version(ad.updated_at)) for ad in ads}
+    cached = cache.get_many(keys.values())
+
+    rendered = {}
+    parts = []
+    for ad in ads:
+        html = cached.get(keys[ad.pk])
+        if html is None:
+            html = render_to_string(CARD_TEMPLATE, {'ad': ad})
+            rendered[keys[ad.pk]] = html
+        parts.append(html)
+
+    if rendered:
+        cache.set_many(rendered, CARD_CACHE_TIMEOUT)
+    _count(CARD_HITS_KEY, len(ads) - len(rendered))
+    _count(CARD_MISSES_KEY, len(rendered))
+    return ''.join(parts)
+
+
+def card_cache_stats():
+    hits = cache.get(CARD_HITS_KEY, 0)
+    misses = cache.get(CARD_MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total * 100 if total else 0,
+    }
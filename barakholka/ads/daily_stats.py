@@ -0,0 +1,80 @@
+import datetime
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models import Count, DateField
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from ads.models import DailyStatistics
+
+
+# Поле снимка -> (модель, поле с моментом создания записи)
+DAILY_SOURCES = {
+    'new_ads': ('ads.Ads', 'created_at'),
+    'new_users': (settings.AUTH_USER_MODEL, 'date_joined'),
+    'new_messages': ('chat.Message', 'timestamp'),
+    'new_favorites': ('ads.Favorite', 'created_at'),
+}
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def _daily_counts(model_label, field, since=None):
+    """{дата: количество} одним GROUP BY date_trunc('day', field) по таблице."""
+    queryset = apps.get_model(model_label)._default_manager.all()
+    if since is not None:
+        queryset = queryset.filter(**{f'{field}__gte': _day_start(since)})
+    return dict(
+        queryset.annotate(day=Trunc(field, 'day', output_field=DateField()))
+        .values('day')
+        .annotate(count=Count('pk'))
+        .order_by()
+        .values_list('day', 'count')
+    )
+
+
+def rollup(since=None):
+    """
+    Пересчитывает снимки с дня since по сегодняшний включительно, по одному
+    запросу на таблицу. since=None — вся история. Возвращает число записанных дней.
+    """
+    days = {}
+    for field, (model_label, date_field) in DAILY_SOURCES.items():
+        for day, count in _daily_counts(model_label, date_field, since).items():
+            days.setdefault(day, {})[field] = count
+
+    today = timezone.localdate()
+    day = since or min(days, default=today)
+    # Дни без активности тоже записываем, чтобы в истории не было пропусков
+    while day <= today:
+        days.setdefault(day, {})
+        day += datetime.timedelta(days=1)
+
+    DailyStatistics.objects.bulk_create(
+        [
+            DailyStatistics(date=day, **{field: counts.get(field, 0) for field in DAILY_SOURCES})
+            for day, counts in sorted(days.items())
+        ],
+        update_conflicts=True,
+        unique_fields=['date'],
+        update_fields=[*DAILY_SOURCES, 'updated_at'],
+        batch_size=1000,
+    )
+    return len(days)
+
+
+def rollup_recent():
+    """
+    Досчитывает новые дни. Последний сохранённый день пересчитывается:
+    в момент прошлого запуска он ещё не закончился.
+    """
+    last_day = DailyStatistics.objects.order_by('-date').values_list('date', flat=True).first()
+    return rollup(since=last_day)
+
+
+def history(days):
+    """Снимки за последние days дней в хронологическом порядке."""
+    return list(DailyStatistics.objects.order_by('-date')[:days])[::-1]
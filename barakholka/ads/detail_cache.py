@@ -0,0 +1,48 @@
+from django.db.models import Prefetch
+
+from ads.card_cache import updated_at_version
+from ads.models import Ads, AdsImage
+from barakholka.cache_utils import get_or_compute
+
+
+DETAIL_CACHE_TIMEOUT = 60 * 60
+# Увеличивается при изменении набора загружаемых данных
+DETAIL_CACHE_SCHEMA = 1
+
+
+def _detail_key(ad_id, version):
+    return f'ads:detail:v{DETAIL_CACHE_SCHEMA}:{ad_id}:{version}'
+
+
+def load_ad_detail(ad_id):
+    """
+    Объявление для страницы: продавец и категория через JOIN,
+    изображения — вторым запросом в порядке показа.
+    """
+    images = AdsImage.objects.order_by('-is_main', 'order', 'id')
+    return (
+        Ads.objects.select_related('seller', 'category')
+        .defer('search_vector', 'seller__password')
+        .prefetch_related(Prefetch('images', queryset=images))
+        .filter(pk=ad_id)
+        .first()
+    )
+
+
+def get_ad_detail(ad_id):
+    """
+    Сквозной кэш страницы объявления. Ключ содержит updated_at объявления
+    (см. card_cache.updated_at_version): его читаем из БД запросом по первичному
+    ключу, поэтому правку из любого процесса видно сразу, а старая копия
+    становится недостижимой без явного удаления. Для несуществующего
+    объявления этот же запрос возвращает None — в кэш ничего не пишется.
+    Счётчики просмотров и избранного в копии могут отставать до следующей правки.
+    """
+    updated_at = Ads.objects.filter(pk=ad_id).order_by().values_list('updated_at', flat=True).first()
+    if updated_at is None:
+        return None
+    return get_or_compute(
+        _detail_key(ad_id, updated_at_version(updated_at)),
+        lambda: load_ad_detail(ad_id),
+        DETAIL_CACHE_TIMEOUT,
+    )
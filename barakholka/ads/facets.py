@@ -0,0 +1,161 @@
+import hashlib
+import json
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, Q, Value, When
+
+from ads.models import Ads
+from barakholka.cache_utils import get_or_compute
+
+
+FACETS_CACHE_TIMEOUT = 60 * 10
+FACETS_VERSION_KEY = 'ads:facets:version'
+
+FACET_FIELDS = ('category', 'type', 'price')
+
+# (ключ, подпись, нижняя граница включительно, верхняя граница не включительно)
+PRICE_RANGES = [
+    ('0-1000', 'До 1 000 ₽', None, 1000),
+    ('1000-5000', '1 000 – 5 000 ₽', 1000, 5000),
+    ('5000-20000', '5 000 – 20 000 ₽', 5000, 20000),
+    ('20000-', 'От 20 000 ₽', 20000, None),
+]
+
+FACET_TITLES = {
+    'category': 'Категория',
+    'type': 'Состояние',
+    'price': 'Цена',
+}
+
+
+def parse_filters(params):
+    """Достаёт из GET-параметров допустимые значения фильтров."""
+    filters = {}
+    category = params.get('category', '')
+    if category.isdigit():
+        filters['category'] = int(category)
+    if params.get('type') in dict(Ads.TYPE_CHOICES):
+        filters['type'] = params['type']
+    if params.get('price') in {key for key, _, _, _ in PRICE_RANGES}:
+        filters['price'] = params['price']
+    return filters
+
+
+def _price_q(key):
+    for range_key, _, low, high in PRICE_RANGES:
+        if range_key == key:
+            q = Q()
+            if low is not None:
+                q &= Q(price__gte=low)
+            if high is not None:
+                q &= Q(price__lt=high)
+            return q
+    return Q()
+
+
+def apply_filters(queryset, filters):
+    for field, value in filters.items():
+        if field == 'price':
+            queryset = queryset.filter(_price_q(value))
+        elif field == 'category':
+            queryset = queryset.filter(category_id=value)
+        else:
+            queryset = queryset.filter(**{field: value})
+    return queryset
+
+
+def _price_range_expression():
+    return Case(
+        *[When(_price_q(key), then=Value(key)) for key, _, _, _ in PRICE_RANGES],
+        output_field=CharField(),
+    )
+
+
+def compute_facet_counts(queryset, filters):
+    """
+    Считает все фасеты одним агрегирующим запросом: GROUP BY по сочетаниям
+    (категория, состояние, диапазон цены). Счётчик каждого фасета учитывает
+    остальные выбранные фильтры, но не собственный.
+    Возвращает счётчики и названия категорий.
+    """
+    rows = (
+        queryset.order_by()
+        .annotate(price_range=_price_range_expression())
+        .values('category', 'category__name', 'type', 'price_range')
+        .annotate(count=Count('id'))
+    )
+
+    counts = {field: defaultdict(int) for field in FACET_FIELDS}
+    category_names = {}
+    for row in rows:
+        category_names[row['category']] = row['category__name']
+        values = {'category': row['category'], 'type': row['type'], 'price': row['price_range']}
+        for field in FACET_FIELDS:
+            if all(values[other] == value for other, value in filters.items() if other != field):
+                counts[field][values[field]] += row['count']
+    return {
+        'counts': {field: dict(field_counts) for field, field_counts in counts.items()},
+        'labels': {'category': category_names},
+    }
+
+
+def _cache_key(filters, search_query):
+    version = cache.get_or_set(FACETS_VERSION_KEY, 1, None)
+    raw = json.dumps({'filters': filters, 'q': search_query}, sort_keys=True, ensure_ascii=False)
+    return f'ads:facets:{version}:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def get_facet_counts(queryset, filters, search_query=''):
+    return get_or_compute(
+        _cache_key(filters, search_query),
+        lambda: compute_facet_counts(queryset, filters),
+        FACETS_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_facet_counts():
+    # Смена версии делает недействительными все ранее сохранённые ключи
+    try:
+        cache.incr(FACETS_VERSION_KEY)
+    except ValueError:
+        cache.set(FACETS_VERSION_KEY, 1, None)
+
+
+def build_facets(facet_data, filters, params):
+    """Готовит фасеты для шаблона: подписи, счётчики и ссылки-переключатели."""
+    counts = facet_data['counts']
+    labels = {
+        'category': facet_data['labels']['category'],
+        'type': dict(Ads.TYPE_CHOICES),
+        'price': {key: label for key, label, _, _ in PRICE_RANGES},
+    }
+    orders = {
+        'type': [value for value, _ in Ads.TYPE_CHOICES],
+        'price': [key for key, _, _, _ in PRICE_RANGES],
+        'category': sorted(counts['category'], key=lambda value: (-counts['category'][value], labels['category'][value])),
+    }
+
+    facets = []
+    for field in FACET_FIELDS:
+        options = []
+        for value in orders[field]:
+            count = counts[field].get(value, 0)
+            selected = filters.get(field) == value
+            if not count and not selected:
+                continue
+            query = params.copy()
+            query.pop('after', None)
+            query.pop('before', None)
+            if selected:
+                query.pop(field, None)
+            else:
+                query[field] = str(value)
+            options.append({
+                'label': labels.get(field, {}).get(value, value),
+                'count': count,
+                'selected': selected,
+                'query': query.urlencode(),
+            })
+        facets.append({'title': FACET_TITLES[field], 'options': options})
+    return facets
@@ -0,0 +1,33 @@
+from django.db.models import Count, Max
+
+from ads.models import Favorite
+
+
+def favorite_ids(request, ad_ids):
+    """
+    Множество id объявлений из ad_ids, которые текущий пользователь
+    добавил в избранное. Один запрос на все переданные объявления;
+    результат запоминается на время запроса, повторно уже проверенные
+    id в БД не запрашиваются.
+    """
+    if not request.user.is_authenticated:
+        return set()
+
+    known = request.__dict__.setdefault('_favorite_ids', set())
+    checked = request.__dict__.setdefault('_favorite_ids_checked', set())
+    ad_ids = set(ad_ids)
+    unchecked = ad_ids - checked
+    if unchecked:
+        known.update(
+            Favorite.objects.filter(user=request.user, ads_id__in=unchecked).order_by().values_list('ads_id', flat=True)
+        )
+        checked.update(unchecked)
+    return known & ad_ids
+
+
+def favorites_version(user):
+    """Признак изменения избранного пользователя — для ETag страниц с сердечками."""
+    if not user.is_authenticated:
+        return None
+    state = Favorite.objects.filter(user=user).aggregate(count=Count('id'), last=Max('id'))
+    return f"{state['count']}:{state['last']}"
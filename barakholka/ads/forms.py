@@ -2,21 +2,42 @@ from django import forms
 from django.forms import inlineformset_factory
 
 from ads import models
-from ads.models import Ads, AdsImage
+from ads.models import Ads, AdsImage, Category
 
 
 class AdsForm(forms.ModelForm):
+    # Категория вводится текстом и приводится к записи справочника Category
+    category = forms.CharField(
+        max_length=100,
+        label='Категория',
+        help_text='Например: Бытовая техника, Конспекты, Одежда и т.д.',
+    )
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        if self.instance.pk and self.instance.category_id:
+            self.initial['category'] = self.instance.category.name
         for field_name, field in self.fields.items():
             if isinstance(field.widget, (forms.widgets.TextInput, forms.widgets.Textarea, forms.widgets.Select, forms.widgets.NumberInput)):
                 field.widget.attrs['class'] = 'form-control'
             elif isinstance(field.widget, forms.widgets.ClearableFileInput):
                 field.widget.attrs['class'] = 'form-control-file'
 
+    def clean_category(self):
+        name = Category.clean_name(self.cleaned_data['category'])
+        if not name:
+            raise forms.ValidationError('Укажите категорию.')
+        return name
+
+    def save(self, commit=True):
+        # Новая категория создаётся только при сохранении: форма с ошибками не оставит пустых записей
+        self.instance.category = Category.objects.resolve(self.cleaned_data['category'])
+        return super().save(commit)
+
     class Meta:
         model = Ads
-        exclude = ('seller',)
+        # Категорию из текста в запись справочника превращает save()
+        exclude = ('seller', 'category')
 
 
 class AdsImageForm(forms.ModelForm):
@@ -0,0 +1,164 @@
+import time
+import traceback
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ads.locks import transaction_lock
+from ads.models import Job
+
+
+# Задача в статусе running дольше этого срока считается брошенной упавшим воркером
+JOB_LOCK_TIMEOUT = timedelta(minutes=10)
+# Пауза перед повтором: RETRY_BASE_DELAY * 2 ** (номер попытки - 1)
+RETRY_BASE_DELAY = timedelta(seconds=30)
+
+TASKS = {}
+# Периодические задачи: имя -> функция, возвращающая интервал в секундах
+PERIODIC = {}
+
+
+def task(name, every=None):
+    """
+    Регистрирует функцию как задачу очереди: @task('ads.build_renditions').
+    every — функция, возвращающая интервал в секундах: после каждого запуска,
+    успешного или окончательно неудачного, очередь сама ставит следующий.
+    """
+    def decorator(func):
+        TASKS[name] = func
+        if every is not None:
+            PERIODIC[name] = every
+        return func
+    return decorator
+
+
+def _schedule_next(job):
+    if job.name in PERIODIC:
+        enqueue(job.name, job.payload, run_at=timezone.now() + timedelta(seconds=PERIODIC[job.name]()))
+
+
+def enqueue(name, payload=None, run_at=None, max_attempts=None):
+    """
+    Ставит задачу в очередь. Запись создаётся в текущей транзакции,
+    поэтому воркер увидит задачу только после её фиксации.
+    """
+    if name not in TASKS:
+        raise ValueError(f'Неизвестная задача: {name}')
+    job = Job(name=name, payload=payload or {})
+    if run_at is not None:
+        job.run_at = run_at
+    if max_attempts is not None:
+        job.max_attempts = max_attempts
+    job.save()
+    return job
+
+
+def schedule_periodic(names=None):
+    """
+    Ставит в очередь периодические задачи, которых в ней нет (ни ожидающей,
+    ни выполняемой). Вызывается воркером при старте, так что цепочки
+    периодических задач запускаются без ручных команд. Возвращает имена поставленных.
+    """
+    names = list(PERIODIC) if names is None else names
+    scheduled = []
+    with transaction.atomic():
+        # Два одновременно стартовавших воркера не поставят задачу дважды
+        transaction_lock('ads.jobs.schedule_periodic')
+        active = set(
+            Job.objects.filter(name__in=names, status__in=[Job.PENDING, Job.RUNNING])
+            .values_list('name', flat=True)
+        )
+        for name in names:
+            if name not in active:
+                enqueue(name)
+                scheduled.append(name)
+    return scheduled
+
+
+def claim_job():
+    """
+    Забирает одну готовую к запуску задачу. SKIP LOCKED позволяет
+    нескольким воркерам разбирать очередь, не дожидаясь друг друга.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.PENDING, run_at__lte=now)
+            .order_by('run_at', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = Job.RUNNING
+        job.locked_at = now
+        job.attempts += 1
+        job.save(update_fields=['status', 'locked_at', 'attempts'])
+    return job
+
+
+def release_stale_jobs():
+    """
+    Разбирает задачи, которые слишком долго числятся выполняемыми: воркер упал
+    (OOM, падение в C-расширении) и не записал результат. Задачи с оставшимися
+    попытками возвращаются в очередь, остальные помечаются неудачными — иначе
+    задача, которая каждый раз роняет воркер, крутилась бы бесконечно.
+    Возвращает (возвращено в очередь, помечено неудачными).
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=now - JOB_LOCK_TIMEOUT)
+    with transaction.atomic():
+        exhausted = list(
+            stale.filter(attempts__gte=F('max_attempts')).select_for_update(skip_locked=True)
+        )
+        for job in exhausted:
+            job.status = Job.FAILED
+            job.finished_at = now
+            job.locked_at = None
+            job.last_error = 'Воркер не завершил задачу: она числилась выполняемой дольше JOB_LOCK_TIMEOUT'
+            job.save(update_fields=['status', 'finished_at', 'locked_at', 'last_error'])
+            _schedule_next(job)
+        released = stale.filter(attempts__lt=F('max_attempts')).update(status=Job.PENDING, locked_at=None)
+    return released, len(exhausted)
+
+
+def run_job(job):
+    """Выполняет задачу и записывает результат и длительность. Возвращает True при успехе."""
+    started = time.monotonic()
+    try:
+        func = TASKS[job.name]
+        func(**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.PENDING
+            job.run_at = timezone.now() + RETRY_BASE_DELAY * 2 ** (job.attempts - 1)
+        else:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+        succeeded = False
+    else:
+        job.status = Job.DONE
+        job.finished_at = timezone.now()
+        succeeded = True
+
+    job.duration_ms = round((time.monotonic() - started) * 1000)
+    job.locked_at = None
+    job.save(update_fields=['status', 'run_at', 'finished_at', 'duration_ms', 'last_error', 'locked_at'])
+    if job.status != Job.PENDING:
+        _schedule_next(job)
+    return succeeded
+
+
+def run_pending(limit=None):
+    """Выполняет готовые задачи, пока очередь не опустеет. Удобно в тестах и shell."""
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim_job()
+        if job is None:
+            break
+        run_job(job)
+        processed += 1
+    return processed
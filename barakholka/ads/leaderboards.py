@@ -0,0 +1,26 @@
+from django.db import connection
+
+from ads.models import TopMessageSender, TopSeller
+
+
+LEADERBOARD_SIZE = 10
+LEADERBOARD_MODELS = [TopSeller, TopMessageSender]
+
+
+def refresh_leaderboards(concurrently=True):
+    """
+    Пересчитывает материализованные представления топов. CONCURRENTLY
+    не блокирует чтение на время пересчёта, но медленнее обычного REFRESH.
+    """
+    mode = ' CONCURRENTLY' if concurrently else ''
+    with connection.cursor() as cursor:
+        for model in LEADERBOARD_MODELS:
+            cursor.execute(f'REFRESH MATERIALIZED VIEW{mode} {connection.ops.quote_name(model._meta.db_table)}')
+
+
+def top_sellers(limit=LEADERBOARD_SIZE):
+    return list(TopSeller.objects.all()[:limit])
+
+
+def top_message_senders(limit=LEADERBOARD_SIZE):
+    return list(TopMessageSender.objects.all()[:limit])
@@ -0,0 +1,37 @@
+import hashlib
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+def _lock_key(name):
+    # pg_advisory_lock принимает bigint — берём 8 байт хэша имени
+    return int.from_bytes(hashlib.sha256(name.encode()).digest()[:8], 'big', signed=True)
+
+
+@contextmanager
+def advisory_lock(name):
+    """
+    Сессионная рекомендательная блокировка PostgreSQL, общая для всех
+    серверов с этой БД. Не ждёт: отдаёт True, если блокировку удалось взять.
+    При обрыве соединения PostgreSQL снимает её сам.
+    """
+    key = _lock_key(name)
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_try_advisory_lock(%s)', [key])
+        acquired = cursor.fetchone()[0]
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [key])
+
+
+def transaction_lock(name):
+    """
+    Транзакционная рекомендательная блокировка: ждёт, пока её отпустят,
+    и снимается сама при завершении текущей транзакции.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', [_lock_key(name)])
@@ -0,0 +1,195 @@
+import csv
+import gzip
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+
+# Таблица выгрузки -> (модель, поле-метка для инкрементальной выгрузки)
+EXPORT_TABLES = {
+    'ads': ('ads.Ads', 'updated_at'),
+    'favorites': ('ads.Favorite', 'created_at'),
+    'chats': ('chat.ChatRoom', 'created_at'),
+    'messages': ('chat.Message', 'timestamp'),
+}
+MANIFEST_NAME = 'manifest.json'
+
+
+def _init_worker():
+    # Модели импортируются только после настройки Django в дочернем процессе
+    django.setup()
+
+
+def _export_columns(model):
+    # Вычисляемые БД поля (поисковый вектор) аналитике не нужны
+    return [
+        field.attname for field in model._meta.concrete_fields
+        if not getattr(field, 'generated', False)
+    ]
+
+
+def export_table(table, output_dir, fmt, compress, since, until, chunk_size):
+    """
+    Выгружает одну таблицу в файл, читая её серверным курсором порциями
+    по chunk_size строк, — память не зависит от размера таблицы.
+    Возвращает (таблица, путь, число строк, секунды).
+    """
+    from django.apps import apps
+
+    started = time.monotonic()
+    model_label, watermark_field = EXPORT_TABLES[table]
+    model = apps.get_model(model_label)
+    columns = _export_columns(model)
+
+    queryset = model._default_manager.filter(**{f'{watermark_field}__lte': until})
+    if since is not None:
+        queryset = queryset.filter(**{f'{watermark_field}__gt': since})
+    rows = queryset.order_by('pk').values_list(*columns).iterator(chunk_size=chunk_size)
+
+    suffix = 'incremental' if since is not None else 'full'
+    filename = f'{table}-{until:%Y%m%dT%H%M%S}-{suffix}.{fmt}' + ('.gz' if compress else '')
+    path = os.path.join(output_dir, filename)
+    tmp_path = path + '.part'
+
+    opener = gzip.open if compress else open
+    count = 0
+    with opener(tmp_path, 'wt', encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        else:
+            for row in rows:
+                f.write(json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder, ensure_ascii=False))
+                f.write('\n')
+                count += 1
+    # Файл появляется под итоговым именем только целиком
+    os.replace(tmp_path, path)
+
+    connections.close_all()
+    return table, path, count, time.monotonic() - started
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоковая выгрузка объявлений, избранного, чатов и сообщений в JSONL или CSV '
+        '(по умолчанию со сжатием gzip). Поддерживает инкрементальную выгрузку по метке времени.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output_dir', help='Каталог для файлов выгрузки')
+        parser.add_argument(
+            '--tables',
+            default=','.join(EXPORT_TABLES),
+            help=f'Таблицы через запятую: {", ".join(EXPORT_TABLES)}',
+        )
+        parser.add_argument(
+            '--format',
+            choices=['jsonl', 'csv'],
+            default='jsonl',
+        )
+        parser.add_argument(
+            '--no-compress',
+            action='store_true',
+            help='Не сжимать файлы',
+        )
+        parser.add_argument(
+            '--since',
+            default=None,
+            help='Выгрузить только строки, изменённые после этой метки (ISO 8601)',
+        )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Взять метки из manifest.json предыдущей выгрузки в этом каталоге',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Выгружать таблицы параллельно в нескольких процессах',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Сколько строк читать из курсора за раз',
+        )
+
+    def handle(self, *args, **options):
+        tables = [table.strip() for table in options['tables'].split(',') if table.strip()]
+        unknown = set(tables) - EXPORT_TABLES.keys()
+        if unknown:
+            raise CommandError(f'Неизвестные таблицы: {", ".join(sorted(unknown))}')
+
+        output_dir = options['output_dir']
+        os.makedirs(output_dir, exist_ok=True)
+        manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+        manifest = self._load_manifest(manifest_path)
+
+        since = None
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError(f'Некорректная метка времени: {options["since"]}')
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+
+        # Верхняя граница общая для всех таблиц — она же станет меткой следующей выгрузки
+        until = timezone.now()
+        jobs = []
+        for table in tables:
+            table_since = since
+            if options['incremental'] and table in manifest:
+                table_since = datetime.fromisoformat(manifest[table]['watermark'])
+            jobs.append((
+                table, output_dir, options['format'], not options['no_compress'],
+                table_since, until, options['chunk_size'],
+            ))
+
+        results = []
+        if options['workers'] > 1 and len(jobs) > 1:
+            # Соединения с БД не должны наследоваться дочерними процессами
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+                futures = [pool.submit(export_table, *job) for job in jobs]
+                for future in as_completed(futures):
+                    results.append(future.result())
+                    self._report(results[-1])
+        else:
+            for job in jobs:
+                results.append(export_table(*job))
+                self._report(results[-1])
+
+        for table, path, count, _ in results:
+            manifest[table] = {
+                'watermark': until.isoformat(),
+                'file': os.path.basename(path),
+                'rows': count,
+            }
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(f'Выгрузка завершена, метка: {until.isoformat()}'))
+
+    def _load_manifest(self, path):
+        if not os.path.exists(path):
+            return {}
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _report(self, result):
+        table, path, count, seconds = result
+        rate = count / seconds if seconds else count
+        self.stdout.write(f'  {table}: {count} строк за {seconds:.1f} с ({rate:.0f} строк/с) -> {path}')
@@ -0,0 +1,399 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ads.facets import invalidate_facet_counts
+from ads.models import Ads, AdsImage, Category, ImportCheckpoint, Job, SiteStatistics
+
+
+TRUE_VALUES = {'1', 'true', 'yes', 'да', 'y'}
+ALLOWED_IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+
+ADS_COLUMNS = ['id', 'seller', 'title', 'description', 'price', 'address',
+               'created_at', 'updated_at', 'available', 'type', 'category',
+               'favorites_count', 'views_count']
+IMAGE_COLUMNS = ['id', 'ads', 'image', 'is_main', 'order', 'renditions']
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class RowError(ValueError):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Массовый импорт объявлений из CSV или JSONL. Строки читаются потоком и '
+        'вставляются пачками (в PostgreSQL — через COPY). После сбоя повторный '
+        'запуск продолжает с последней сохранённой пачки; полностью импортированный '
+        'источник повторно не загружается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл CSV/JSONL или «-» для чтения из stdin')
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'jsonl'],
+            default=None,
+            help='Формат входных данных (по умолчанию — по расширению файла)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько строк вставлять в одной транзакции',
+        )
+        parser.add_argument(
+            '--images-dir',
+            default=None,
+            help='Каталог, относительно которого указаны пути к фото (по умолчанию — каталог файла)',
+        )
+        parser.add_argument(
+            '--name',
+            default=None,
+            help=(
+                'Имя импорта для продолжения после сбоя (по умолчанию — полный путь к файлу '
+                'или «stdin» и хэш содержимого)'
+            ),
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Начать импорт источника заново, не учитывая сохранённый прогресс',
+        )
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Вставлять через bulk_create даже в PostgreSQL',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        if path == '-':
+            # stdin нельзя перечитать, а хэш нужен до начала импорта — копируем во временный файл
+            source = tempfile.TemporaryFile()
+            shutil.copyfileobj(sys.stdin.buffer, source, READ_CHUNK_SIZE)
+            location = 'stdin'
+            images_dir = options['images_dir'] or os.getcwd()
+        else:
+            if not os.path.isfile(path):
+                raise CommandError(f'Файл не найден: {path}')
+            source = open(path, 'rb')
+            location = os.path.abspath(path)
+            images_dir = options['images_dir'] or os.path.dirname(os.path.abspath(path))
+        # Хэш в имени отличает разные данные под одним именем (stdin, перезаписанный файл):
+        # прогресс одного источника не должен пропускать строки другого
+        name = options['name'] or f'{location[-230:]}#{self._fingerprint(source)}'
+
+        self.images_dir = images_dir
+        self.use_copy = connection.vendor == 'postgresql' and not options['no_copy']
+        self.image_field = AdsImage._meta.get_field('image')
+        # Таблицы соответствия: имя пользователя -> id, ключ категории -> id
+        self.sellers = {}
+        self.categories = {}
+
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(name=name)
+        if options['restart']:
+            checkpoint.rows_done = 0
+            checkpoint.ads_created = 0
+            checkpoint.finished_at = None
+            checkpoint.save()
+        elif checkpoint.finished_at is not None:
+            source.close()
+            self.stdout.write(self.style.WARNING(
+                f'Импорт «{name}» уже завершён {checkpoint.finished_at:%d.%m.%Y %H:%M}, '
+                f'создано объявлений: {checkpoint.ads_created}. Ничего не загружено; '
+                f'для повторного импорта укажите --restart'
+            ))
+            return
+        skip = checkpoint.rows_done
+        if skip:
+            self.stdout.write(f'Продолжаем импорт «{name}» со строки {skip + 1}')
+
+        self.stats = {'rows': 0, 'ads': 0, 'images': 0, 'errors': 0}
+        self.started = time.monotonic()
+
+        batch = []
+        with io.TextIOWrapper(source, encoding='utf-8-sig', newline='') as stream:
+            for line_no, row in enumerate(self._read(stream, fmt), 1):
+                if line_no <= skip:
+                    continue
+                batch.append((line_no, row))
+                if len(batch) >= options['batch_size']:
+                    self._import_batch(batch, checkpoint)
+                    batch = []
+            if batch:
+                self._import_batch(batch, checkpoint)
+
+        checkpoint.finished_at = timezone.now()
+        checkpoint.save(update_fields=['finished_at', 'updated_at'])
+        if self.stats['ads']:
+            invalidate_facet_counts()
+
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {elapsed:.1f} с: строк {self.stats["rows"]}, объявлений {self.stats["ads"]}, '
+            f'фото {self.stats["images"]}, пропущено с ошибками {self.stats["errors"]}'
+        ))
+
+    def _fingerprint(self, source):
+        digest = hashlib.sha256()
+        source.seek(0)
+        for chunk in iter(lambda: source.read(READ_CHUNK_SIZE), b''):
+            digest.update(chunk)
+        source.seek(0)
+        return digest.hexdigest()[:16]
+
+    def _read(self, stream, fmt):
+        if fmt == 'csv':
+            yield from csv.DictReader(stream)
+            return
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # Повреждённая строка станет ошибкой разбора, нумерация строк не собьётся
+                yield None
+
+    # Разбор строк
+
+    def _parse(self, row):
+        if not isinstance(row, dict):
+            raise RowError('строка не является объектом')
+
+        def value(key):
+            raw = row.get(key)
+            return raw.strip() if isinstance(raw, str) else raw
+
+        def text(key):
+            # В JSONL в текстовом поле может оказаться число, список или объект
+            raw = value(key)
+            if raw is not None and not isinstance(raw, str):
+                raise RowError(f'поле {key} должно быть строкой: {raw!r}')
+            return raw
+
+        title = text('title')
+        if not title:
+            raise RowError('не указано название')
+        seller = text('seller')
+        if not seller:
+            raise RowError('не указан продавец')
+        category = text('category')
+        if not category:
+            raise RowError('не указана категория')
+
+        try:
+            price = Decimal(str(value('price')).replace(' ', '').replace(',', '.'))
+        except InvalidOperation:
+            raise RowError(f'некорректная цена: {row.get("price")!r}')
+        if not price.is_finite() or price < 0 or price >= Decimal('1e8'):
+            raise RowError(f'некорректная цена: {row.get("price")!r}')
+
+        ad_type = text('type') or Ads.NEW
+        types = {key: key for key, _ in Ads.TYPE_CHOICES}
+        types.update({label.casefold(): key for key, label in Ads.TYPE_CHOICES})
+        if ad_type.casefold() not in types:
+            raise RowError(f'неизвестное состояние: {ad_type!r}')
+
+        available = value('available')
+        if isinstance(available, str):
+            available = available.casefold() in TRUE_VALUES if available else True
+        elif available is None:
+            available = True
+
+        images = row.get('images') or []
+        if isinstance(images, str):
+            images = [path for path in images.split('|') if path.strip()]
+        if not isinstance(images, list):
+            raise RowError(f'images должно быть списком путей: {images!r}')
+        image_paths = []
+        for image in images:
+            if not isinstance(image, str):
+                raise RowError(f'путь к изображению должен быть строкой: {image!r}')
+            image_path = os.path.join(self.images_dir, image.strip())
+            if os.path.splitext(image_path)[1].lower() not in ALLOWED_IMAGE_EXTENSIONS:
+                raise RowError(f'недопустимый формат изображения: {image}')
+            if not os.path.isfile(image_path):
+                raise RowError(f'файл изображения не найден: {image}')
+            image_paths.append(image_path)
+
+        return {
+            'seller': seller,
+            'title': title[:500],
+            'description': text('description') or None,
+            'price': price.quantize(Decimal('0.01')),
+            'address': (text('address') or '')[:500],
+            'available': bool(available),
+            'type': types[ad_type.casefold()],
+            'category': Category.clean_name(category),
+            'images': image_paths,
+        }
+
+    def _resolve_sellers(self, usernames):
+        missing = set(usernames) - self.sellers.keys()
+        if missing:
+            User = get_user_model()
+            self.sellers.update(
+                User.objects.filter(username__in=missing).values_list('username', 'id')
+            )
+
+    def _resolve_categories(self, names):
+        keys = {Category.make_key(name): name for name in names}
+        missing = keys.keys() - self.categories.keys()
+        if missing:
+            self.categories.update(Category.objects.filter(key__in=missing).values_list('key', 'id'))
+            for key in missing - self.categories.keys():
+                self.categories[key] = Category.objects.resolve(keys[key]).pk
+
+    # Вставка
+
+    def _import_batch(self, batch, checkpoint):
+        parsed = []
+        for line_no, row in batch:
+            try:
+                parsed.append((line_no, self._parse(row)))
+            except RowError as e:
+                self._row_error(line_no, e)
+
+        self._resolve_sellers({data['seller'] for _, data in parsed})
+        self._resolve_categories({data['category'] for _, data in parsed})
+        valid = []
+        for line_no, data in parsed:
+            if data['seller'] not in self.sellers:
+                self._row_error(line_no, f'продавец {data["seller"]!r} не найден')
+            else:
+                valid.append(data)
+
+        with transaction.atomic():
+            ads_count, images_count = self._insert(valid)
+            checkpoint.rows_done = batch[-1][0]
+            checkpoint.ads_created += ads_count
+            checkpoint.save(update_fields=['rows_done', 'ads_created', 'updated_at'])
+
+        self.stats['rows'] += len(batch)
+        self.stats['ads'] += ads_count
+        self.stats['images'] += images_count
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(
+            f'  Строк: {self.stats["rows"]}, объявлений: {self.stats["ads"]}, '
+            f'{self.stats["rows"] / elapsed:.0f} строк/с'
+        )
+
+    def _row_error(self, line_no, error):
+        self.stats['errors'] += 1
+        self.stderr.write(f'  Строка {line_no}: {error}')
+
+    def _insert(self, rows):
+        if not rows:
+            return 0, 0
+        now = timezone.now()
+        ad_ids = self._next_ids(Ads, len(rows)) if self.use_copy else [None] * len(rows)
+        ads = [
+            Ads(
+                id=ad_id,
+                seller_id=self.sellers[data['seller']],
+                title=data['title'],
+                description=data['description'],
+                price=data['price'],
+                address=data['address'],
+                created_at=now,
+                updated_at=now,
+                available=data['available'],
+                type=data['type'],
+                category_id=self.categories[Category.make_key(data['category'])],
+            )
+            for ad_id, data in zip(ad_ids, rows)
+        ]
+        if self.use_copy:
+            self._copy(Ads, ADS_COLUMNS, ads)
+        else:
+            ads = Ads.objects.bulk_create(ads)
+
+        images = []
+        for ad, data in zip(ads, rows):
+            for order, image_path in enumerate(data['images'], 1):
+                with open(image_path, 'rb') as f:
+                    # Хранилище по содержимому: одинаковые фото партнёра лягут на диск один раз
+                    name = self.image_field.storage.save(
+                        self.image_field.generate_filename(None, os.path.basename(image_path)),
+                        File(f),
+                    )
+                images.append(AdsImage(ads_id=ad.pk, image=name, is_main=order == 1, order=order, renditions={}))
+        if images:
+            if self.use_copy:
+                for image, image_id in zip(images, self._next_ids(AdsImage, len(images))):
+                    image.id = image_id
+                self._copy(AdsImage, IMAGE_COLUMNS, images)
+            else:
+                images = AdsImage.objects.bulk_create(images)
+            # Сигналы при массовой вставке не срабатывают — копии заказываем сами
+            Job.objects.bulk_create([
+                Job(name='ads.build_renditions', payload={'image_id': image.pk}) for image in images
+            ])
+
+        active_by_category = {}
+        for ad in ads:
+            if ad.available:
+                active_by_category[ad.category_id] = active_by_category.get(ad.category_id, 0) + 1
+        for category_id, count in active_by_category.items():
+            Category.objects.filter(pk=category_id).update(active_ads_count=F('active_ads_count') + count)
+        SiteStatistics.shift(total_ads=len(ads), active_ads=sum(active_by_category.values()))
+
+        return len(ads), len(images)
+
+    def _next_ids(self, model, count):
+        """Заранее берёт значения из последовательности первичного ключа — COPY их не возвращает."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)',
+                [model._meta.db_table, model._meta.pk.column, count],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def _copy(self, model, fields, objects):
+        quote = connection.ops.quote_name
+        columns = [model._meta.get_field(field).column for field in fields]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for obj in objects:
+            row = []
+            for column in columns:
+                value = getattr(obj, column)
+                if value is None:
+                    value = r'\N'
+                elif isinstance(value, dict):
+                    value = json.dumps(value)
+                row.append(value)
+            writer.writerow(row)
+        buffer.seek(0)
+
+        sql = (
+            f'COPY {quote(model._meta.db_table)} ({", ".join(quote(column) for column in columns)}) '
+            f"FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+        )
+        with connection.cursor() as cursor:
+            raw = cursor.cursor
+            if hasattr(raw, 'copy_expert'):
+                # psycopg2
+                raw.copy_expert(sql, buffer)
+            else:
+                # psycopg 3
+                with raw.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
@@ -0,0 +1,91 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ads.models import AdsImage
+from ads.storage import CONTENT_NAME_RE, is_content_addressed
+
+
+class Command(BaseCommand):
+    help = (
+        'Переводит уже загруженные изображения объявлений в хранилище по содержимому: '
+        'файлы переименовываются на месте в MEDIA_ROOT, дубликаты удаляются, '
+        'заводятся счётчики ссылок'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько записей AdsImage читать за один запрос',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только посчитать записи, которые нужно перенести',
+        )
+
+    def handle(self, *args, **options):
+        storage = AdsImage._meta.get_field('image').storage
+        # Записи со старыми именами; регулярное выражение то же, что в ads.storage
+        legacy = AdsImage.objects.exclude(image__regex=CONTENT_NAME_RE.pattern).exclude(image='')
+
+        if options['dry_run']:
+            self.stdout.write(f'Изображений со старыми именами: {legacy.count()}')
+            return
+
+        stats = {'files': 0, 'duplicates': 0, 'missing': 0, 'freed': 0}
+        last_pk = 0
+        while True:
+            # Пачки по первичному ключу — не держим ни курсор, ни весь список в памяти
+            batch = list(
+                legacy.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', 'image', 'renditions')[:options['batch_size']]
+            )
+            if not batch:
+                break
+            for pk, name, renditions in batch:
+                self._migrate_row(storage, pk, name, renditions, stats)
+            last_pk = batch[-1][0]
+            self.stdout.write(f'  Обработано до id={last_pk}, файлов: {stats["files"]}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: файлов перенесено {stats["files"]}, дубликатов удалено {stats["duplicates"]} '
+            f'({stats["freed"] // 1024} КБ), не найдено {stats["missing"]}'
+        ))
+
+    def _migrate_row(self, storage, pk, name, renditions, stats):
+        new_name = self._migrate_file(storage, name, stats)
+        if new_name is None:
+            return
+        new_renditions = {
+            fmt: {
+                width: self._migrate_file(storage, path, stats) or path
+                for width, path in by_width.items()
+            }
+            for fmt, by_width in (renditions or {}).items()
+        }
+        with transaction.atomic():
+            # Старое имя могло встречаться в нескольких записях — переводим их все сразу
+            updated = AdsImage.objects.filter(image=name).update(image=new_name)
+            AdsImage.objects.filter(pk=pk).update(renditions=new_renditions)
+            storage.add_reference(new_name, count=updated)
+            for by_width in new_renditions.values():
+                for path in by_width.values():
+                    if is_content_addressed(path):
+                        storage.add_reference(path)
+
+    def _migrate_file(self, storage, name, stats):
+        if is_content_addressed(name):
+            return name
+        if not storage.exists(name):
+            stats['missing'] += 1
+            self.stdout.write(self.style.WARNING(f'  Файл не найден: {name}'))
+            return None
+        size = storage.size(name)
+        new_name, duplicate = storage.adopt(name)
+        stats['files'] += 1
+        if duplicate:
+            stats['duplicates'] += 1
+            stats['freed'] += size
+        return new_name
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ads.jobs import schedule_periodic
+from ads.leaderboards import refresh_leaderboards
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает материализованные представления с топами пользователей '
+        'для страницы статистики. Запускать по расписанию.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--no-concurrently',
+            action='store_true',
+            help='Обычный REFRESH: быстрее, но блокирует чтение топов на время пересчёта',
+        )
+        parser.add_argument(
+            '--schedule',
+            action='store_true',
+            help='Поставить периодическую задачу в фоновую очередь, если её там нет (run_jobs делает это сам при старте)',
+        )
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            if schedule_periodic(['ads.refresh_leaderboards']):
+                self.stdout.write(self.style.SUCCESS('Задача поставлена в очередь'))
+            else:
+                self.stdout.write('Задача уже в очереди')
+            return
+
+        started = time.monotonic()
+        refresh_leaderboards(concurrently=not options['no_concurrently'])
+        self.stdout.write(self.style.SUCCESS(f'Топы пересчитаны за {time.monotonic() - started:.1f} с'))
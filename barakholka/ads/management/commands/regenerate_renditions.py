@@ -0,0 +1,73 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from ads.models import AdsImage
+
+
+def _init_worker():
+    # При запуске через spawn/forkserver процессу нужно заново настроить Django
+    django.setup()
+
+
+def _regenerate(image_ids):
+    done, failed = 0, []
+    for image in AdsImage.objects.filter(pk__in=image_ids):
+        try:
+            image.refresh_renditions()
+            done += 1
+        except Exception as e:
+            failed.append((image.pk, str(e)))
+    connections.close_all()
+    return done, failed
+
+
+class Command(BaseCommand):
+    help = 'Пересоздаёт уменьшенные копии изображений объявлений в нескольких процессах'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Количество процессов (по умолчанию — число ядер)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Сколько изображений передавать процессу за раз',
+        )
+        parser.add_argument(
+            '--missing-only',
+            action='store_true',
+            help='Обрабатывать только изображения без копий',
+        )
+
+    def handle(self, *args, **options):
+        images = AdsImage.objects.order_by('pk')
+        if options['missing_only']:
+            images = images.filter(renditions={})
+        image_ids = list(images.values_list('pk', flat=True))
+        batch_size = options['batch_size']
+        batches = [image_ids[i:i + batch_size] for i in range(0, len(image_ids), batch_size)]
+
+        self.stdout.write(f'Изображений к обработке: {len(image_ids)}')
+
+        # Соединения с БД не должны наследоваться дочерними процессами
+        connections.close_all()
+
+        total_done, total_failed = 0, []
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+            futures = [pool.submit(_regenerate, batch) for batch in batches]
+            for future in as_completed(futures):
+                done, failed = future.result()
+                total_done += done
+                total_failed.extend(failed)
+                self.stdout.write(f'  Обработано: {total_done} из {len(image_ids)}')
+
+        for pk, error in total_failed:
+            self.stdout.write(self.style.ERROR(f'  Изображение {pk}: {error}'))
+        self.stdout.write(self.style.SUCCESS(f'Готово: {total_done}, ошибок: {len(total_failed)}'))
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from ads.daily_stats import rollup, rollup_recent
+from ads.jobs import schedule_periodic
+
+
+class Command(BaseCommand):
+    help = (
+        'Досчитывает дневную статистику (новые объявления, пользователи, сообщения, '
+        'избранное). С --backfill строит всю историю заново, по одному проходу на таблицу.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backfill',
+            action='store_true',
+            help='Пересчитать всю историю',
+        )
+        parser.add_argument(
+            '--since',
+            default=None,
+            help='Пересчитать дни начиная с этой даты (ГГГГ-ММ-ДД)',
+        )
+        parser.add_argument(
+            '--schedule',
+            action='store_true',
+            help='Поставить периодическую задачу в фоновую очередь, если её там нет (run_jobs делает это сам при старте)',
+        )
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            if schedule_periodic(['ads.rollup_daily_statistics']):
+                self.stdout.write(self.style.SUCCESS('Задача поставлена в очередь'))
+            else:
+                self.stdout.write('Задача уже в очереди')
+            return
+
+        started = time.monotonic()
+        if options['since']:
+            since = parse_date(options['since'])
+            if since is None:
+                raise CommandError(f'Некорректная дата: {options["since"]}')
+            days = rollup(since=since)
+        elif options['backfill']:
+            days = rollup()
+        else:
+            days = rollup_recent()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Записано дней: {days} за {time.monotonic() - started:.1f} с'
+        ))
@@ -0,0 +1,72 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ads.jobs import claim_job, release_stale_jobs, run_job, schedule_periodic
+from ads.models import Job
+
+
+class Command(BaseCommand):
+    help = (
+        'Воркер фоновой очереди: выполняет задачи из таблицы Job. При старте ставит '
+        'в очередь недостающие периодические задачи (дневная статистика, топы).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить готовые задачи и завершиться',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help='Пауза в секундах, когда очередь пуста',
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=None,
+            help='Завершиться после указанного количества задач',
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+        self._release_stale()
+        for name in schedule_periodic():
+            self.stdout.write(f'Периодическая задача поставлена в очередь: {name}')
+
+        try:
+            while options['max_jobs'] is None or processed < options['max_jobs']:
+                job = claim_job()
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+                    self._release_stale()
+                    continue
+
+                succeeded = run_job(job)
+                processed += 1
+                self._report(job, succeeded)
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f'Выполнено задач: {processed}'))
+
+    def _release_stale(self):
+        released, failed = release_stale_jobs()
+        if released:
+            self.stdout.write(self.style.WARNING(f'Возвращено в очередь зависших задач: {released}'))
+        if failed:
+            self.stdout.write(self.style.ERROR(f'Зависшие задачи без оставшихся попыток помечены неудачными: {failed}'))
+
+    def _report(self, job, succeeded):
+        line = f'{job.name} #{job.pk}: {job.duration_ms} мс, попытка {job.attempts}'
+        if succeeded:
+            self.stdout.write(f'  {line}')
+        elif job.status == Job.FAILED:
+            self.stdout.write(self.style.ERROR(f'  {line} — ошибка, попытки исчерпаны'))
+        else:
+            self.stdout.write(self.style.WARNING(f'  {line} — ошибка, повтор в {job.run_at:%H:%M:%S}'))
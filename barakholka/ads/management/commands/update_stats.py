@@ -1,8 +1,33 @@
-from django.core.management.base import BaseCommand
-from ads.models import SiteStatistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from ads.locks import advisory_lock
+from ads.models import Category, SiteStatistics
+
+
+COUNTERS = [
+    ('total_ads', 'Объявлений'),
+    ('active_ads', 'Активных объявлений'),
+    ('total_users', 'Пользователей'),
+    ('total_chats', 'Чатов'),
+    ('total_messages', 'Сообщений'),
+    ('total_favorites', 'В избранном'),
+]
+LOCK_NAME = 'ads.update_stats'
+# Раз в столько циклов демон пересчитывает всё: QuerySet.update() не сдвигает
+# водяной знак таблицы, и такое расхождение иначе не будет замечено
+FULL_EVERY_DEFAULT = 10
+
 
 class Command(BaseCommand):
-    help = 'Обновляет статистику сайта'
+    help = (
+        'Пересчитывает статистику сайта и счётчики объявлений в категориях. Счётчики '
+        'поддерживаются сигналами, команда исправляет накопившиеся расхождения. '
+        'С --interval работает как демон; одновременно пересчёт выполняет только '
+        'один процесс на всю БД.'
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -10,26 +35,82 @@ class Command(BaseCommand):
             action='store_true',
             help='Показывать подробную информацию',
         )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=None,
+            help='Повторять пересчёт каждые N секунд, не завершаясь',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help=(
+                'Пересчитать все счётчики, даже если таблицы не менялись. Режим сверки: '
+                'находит расхождения после массовых QuerySet.update(), которые не '
+                'меняют водяной знак таблицы'
+            ),
+        )
+        parser.add_argument(
+            '--full-every',
+            type=int,
+            default=FULL_EVERY_DEFAULT,
+            help=f'С --interval: каждый N-й цикл выполнять как --full (по умолчанию {FULL_EVERY_DEFAULT})',
+        )
 
     def handle(self, *args, **options):
-        verbose = options['verbose']
+        interval = options['interval']
+        if interval is not None and interval <= 0:
+            raise CommandError('--interval должен быть больше нуля')
+        if options['full_every'] <= 0:
+            raise CommandError('--full-every должен быть больше нуля')
 
+        try:
+            while True:
+                with advisory_lock(LOCK_NAME) as acquired:
+                    if acquired:
+                        self._update(options, full=options['full'])
+                        # Блокировку держим всё время работы демона — второй экземпляр ждёт в резерве
+                        cycle = 0
+                        while interval:
+                            time.sleep(interval)
+                            cycle += 1
+                            self._update(options, full=options['full'] or cycle % options['full_every'] == 0)
+                        return
+                if not interval:
+                    self.stdout.write(self.style.WARNING('Статистику уже пересчитывает другой процесс'))
+                    return
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        except DatabaseError as e:
+            raise CommandError(f'Ошибка при обновлении статистики: {e}')
+
+    def _update(self, options, full):
         self.stdout.write('Обновление статистики сайта...')
+        started = time.monotonic()
 
-        try:
-            stats = SiteStatistics.get_current_stats()
-            stats.update_stats()
-
-            if verbose:
-                self.stdout.write(self.style.SUCCESS('Статистика успешно обновлена:'))
-                self.stdout.write(f'  Объявлений: {stats.total_ads}')
-                self.stdout.write(f'  Активных объявлений: {stats.active_ads}')
-                self.stdout.write(f'  Пользователей: {stats.total_users}')
-                self.stdout.write(f'  Чатов: {stats.total_chats}')
-                self.stdout.write(f'  Сообщений: {stats.total_messages}')
-                self.stdout.write(f'  В избранном: {stats.total_favorites}')
-            else:
-                self.stdout.write(self.style.SUCCESS('Статистика успешно обновлена'))
-
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Ошибка при обновлении статистики: {e}'))
+        stats = SiteStatistics.get_current_stats()
+        before = {field: getattr(stats, field) for field, _ in COUNTERS}
+        stats.update_stats(only_changed=not full)
+        categories = None
+        if 'total_ads' in stats.recounted:
+            # Счётчики категорий сдвигаются сигналами так же, как статистика, и так же расходятся
+            categories = Category.objects.refresh_counters()
+
+        elapsed = time.monotonic() - started
+        if options['verbose']:
+            self.stdout.write(self.style.SUCCESS(f'Статистика успешно обновлена за {elapsed:.2f} с:'))
+            for field, label in COUNTERS:
+                value = getattr(stats, field)
+                drift = value - before[field]
+                suffix = f' (расхождение {drift:+d})' if drift else ''
+                if field in stats.recounted:
+                    timing = f'{stats.timings[field]} мс'
+                else:
+                    timing = 'таблица не менялась'
+                prefix = '≈' if field in stats.approximate_fields else ''
+                self.stdout.write(f'  {label}: {prefix}{value}{suffix} [{timing}]')
+            if categories is not None:
+                self.stdout.write(f'  Пересчитаны счётчики категорий: {categories}')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Статистика успешно обновлена за {elapsed:.2f} с'))
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 08:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0007_remove_deal_request'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='ads',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='ads',
+            index=models.Index(condition=models.Q(('available', True)), fields=['-created_at', '-id'], name='ads_available_feed_idx'),
+        ),
+    ]
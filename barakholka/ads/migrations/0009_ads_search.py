@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-18 08:38
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0008_ads_feed_keyset_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='ads',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('title', config='russian', weight='A'), '||', django.contrib.postgres.search.SearchVector('category', config='russian', weight='B'), django.contrib.postgres.search.SearchConfig('russian')), '||', django.contrib.postgres.search.SearchVector('description', config='russian', weight='C'), django.contrib.postgres.search.SearchConfig('russian')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='ads',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='ads_search_vector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ads',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='ads_title_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
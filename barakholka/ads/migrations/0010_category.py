@@ -0,0 +1,53 @@
+# Generated by Django 6.0 on 2026-10-18 09:10
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0009_ads_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Название')),
+                ('key', models.CharField(max_length=100, unique=True, verbose_name='Ключ')),
+                ('active_ads_count', models.PositiveIntegerField(default=0, verbose_name='Активных объявлений')),
+            ],
+            options={
+                'verbose_name': 'Категория',
+                'verbose_name_plural': 'Категории',
+                'ordering': ['name'],
+            },
+        ),
+        # Сгенерированный столбец ссылается на текстовую категорию — пересоздаём его без неё
+        migrations.RemoveIndex(
+            model_name='ads',
+            name='ads_search_vector_idx',
+        ),
+        migrations.RemoveField(
+            model_name='ads',
+            name='search_vector',
+        ),
+        migrations.AddField(
+            model_name='ads',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('title', config='russian', weight='A'), '||', django.contrib.postgres.search.SearchVector('description', config='russian', weight='B'), django.contrib.postgres.search.SearchConfig('russian')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='ads',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='ads_search_vector_idx'),
+        ),
+        migrations.AddField(
+            model_name='ads',
+            name='category_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='ads.category'),
+        ),
+    ]
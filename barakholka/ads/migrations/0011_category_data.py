@@ -0,0 +1,66 @@
+# Generated by Django 6.0 on 2026-10-18 09:10
+
+from django.db import migrations
+from django.db.models import Case, Count, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+BATCH_SIZE = 2000
+
+
+def normalize(name):
+    name = ' '.join(name.split())
+    return name[:1].upper() + name[1:], name.casefold()
+
+
+def fill_categories(apps, schema_editor):
+    Ads = apps.get_model('ads', 'Ads')
+    Category = apps.get_model('ads', 'Category')
+
+    # Справочник: одна запись на каждое нормализованное название
+    category_ids = {}
+    raw_to_key = {}
+    for raw in Ads.objects.order_by().values_list('category', flat=True).distinct().iterator():
+        name, key = normalize(raw or '') if (raw or '').strip() else ('Без категории', 'без категории')
+        raw_to_key[raw] = key
+        if key not in category_ids:
+            category_ids[key] = Category.objects.get_or_create(key=key, defaults={'name': name})[0].pk
+
+    # Проставляем ссылки пачками по диапазонам первичного ключа
+    last_pk = 0
+    while True:
+        batch = list(
+            Ads.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        batch_ads = Ads.objects.filter(pk__gte=batch[0], pk__lte=batch[-1])
+        raws = batch_ads.order_by().values_list('category', flat=True).distinct()
+        batch_ads.update(category_ref=Case(
+            *[When(category=raw, then=Value(category_ids[raw_to_key[raw]])) for raw in raws],
+        ))
+        last_pk = batch[-1]
+
+    active_ads = (
+        Ads.objects.filter(category_ref=OuterRef('pk'), available=True)
+        .order_by().values('category_ref').annotate(count=Count('id')).values('count')
+    )
+    Category.objects.update(active_ads_count=Coalesce(Subquery(active_ads), 0))
+
+
+def restore_category_names(apps, schema_editor):
+    Ads = apps.get_model('ads', 'Ads')
+    Category = apps.get_model('ads', 'Category')
+    Ads.objects.update(category=Subquery(
+        Category.objects.filter(pk=OuterRef('category_ref')).values('name')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0010_category'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_categories, restore_category_names),
+    ]
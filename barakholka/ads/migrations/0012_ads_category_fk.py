@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-18 09:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0011_category_data'),
+    ]
+
+    operations = [
+        # Значение по умолчанию нужно только для отката: столбец возвращается непустым
+        migrations.AlterField(
+            model_name='ads',
+            name='category',
+            field=models.CharField(default='', help_text='Например: Бытовая техника, Конспекты, Одежда и т.д.', max_length=100, verbose_name='Категория'),
+        ),
+        migrations.RemoveField(
+            model_name='ads',
+            name='category',
+        ),
+        migrations.RenameField(
+            model_name='ads',
+            old_name='category_ref',
+            new_name='category',
+        ),
+        migrations.AlterField(
+            model_name='ads',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='ads', to='ads.category', verbose_name='Категория'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0 on 2026-10-18 09:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0012_ads_category_fk'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ads',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='Дата изменения'),
+            preserve_default=False,
+        ),
+        migrations.RunSQL(
+            'UPDATE ads_ads SET updated_at = created_at',
+            migrations.RunSQL.noop,
+        ),
+    ]
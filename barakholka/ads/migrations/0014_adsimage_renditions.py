@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 08:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0013_ads_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='adsimage',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
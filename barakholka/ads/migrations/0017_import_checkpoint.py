@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-18 08:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0016_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Источник')),
+                ('rows_done', models.PositiveBigIntegerField(default=0, verbose_name='Обработано строк')),
+                ('ads_created', models.PositiveIntegerField(default=0, verbose_name='Создано объявлений')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Импорт объявлений',
+                'verbose_name_plural': 'Импорт объявлений',
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-18 08:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0017_import_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ads',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='ads',
+            name='views_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Просмотров'),
+        ),
+        migrations.RunSQL(
+            'UPDATE ads_ads SET favorites_count = f.count '
+            'FROM (SELECT ads_id, COUNT(*) AS count FROM ads_favorite GROUP BY ads_id) AS f '
+            'WHERE ads_ads.id = f.ads_id',
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-18 09:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0018_ads_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='Дата')),
+                ('new_ads', models.PositiveIntegerField(default=0, verbose_name='Новых объявлений')),
+                ('new_users', models.PositiveIntegerField(default=0, verbose_name='Новых пользователей')),
+                ('new_messages', models.PositiveIntegerField(default=0, verbose_name='Сообщений')),
+                ('new_favorites', models.PositiveIntegerField(default=0, verbose_name='Добавлений в избранное')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Статистика за день',
+                'verbose_name_plural': 'Статистика по дням',
+                'ordering': ['-date'],
+            },
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 6.0 on 2026-10-18 09:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0019_daily_statistics'),
+        ('user', '0004_auto_20251228_1426'),
+        ('chat', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopMessageSender',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('username', models.CharField(max_length=150, verbose_name='Пользователь')),
+                ('messages_count', models.PositiveIntegerField(verbose_name='Сообщений')),
+            ],
+            options={
+                'verbose_name': 'Топ по сообщениям',
+                'verbose_name_plural': 'Топ по сообщениям',
+                'db_table': 'ads_top_message_senders',
+                'ordering': ['-messages_count', 'username'],
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='TopSeller',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('username', models.CharField(max_length=150, verbose_name='Пользователь')),
+                ('ads_count', models.PositiveIntegerField(verbose_name='Объявлений')),
+            ],
+            options={
+                'verbose_name': 'Топ по объявлениям',
+                'verbose_name_plural': 'Топ по объявлениям',
+                'db_table': 'ads_top_sellers',
+                'ordering': ['-ads_count', 'username'],
+                'managed': False,
+            },
+        ),
+        # Уникальный индекс нужен для REFRESH MATERIALIZED VIEW CONCURRENTLY,
+        # второй — чтобы топ-10 читался по индексу, а не сортировкой всего представления
+        migrations.RunSQL(
+            [
+                'CREATE MATERIALIZED VIEW ads_top_sellers AS '
+                'SELECT u.id AS user_id, u.username, COUNT(*) AS ads_count '
+                'FROM ads_ads a JOIN user_user u ON u.id = a.seller_id '
+                'GROUP BY u.id, u.username',
+                'CREATE UNIQUE INDEX ads_top_sellers_user_idx ON ads_top_sellers (user_id)',
+                'CREATE INDEX ads_top_sellers_rank_idx ON ads_top_sellers (ads_count DESC, username)',
+            ],
+            'DROP MATERIALIZED VIEW ads_top_sellers',
+        ),
+        migrations.RunSQL(
+            [
+                'CREATE MATERIALIZED VIEW ads_top_message_senders AS '
+                'SELECT u.id AS user_id, u.username, COUNT(*) AS messages_count '
+                'FROM chat_message m JOIN user_user u ON u.id = m.sender_id '
+                'GROUP BY u.id, u.username',
+                'CREATE UNIQUE INDEX ads_top_message_senders_user_idx ON ads_top_message_senders (user_id)',
+                'CREATE INDEX ads_top_message_senders_rank_idx '
+                'ON ads_top_message_senders (messages_count DESC, username)',
+            ],
+            'DROP MATERIALIZED VIEW ads_top_message_senders',
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 09:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0020_leaderboards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sitestatistics',
+            name='timings',
+            field=models.JSONField(default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='sitestatistics',
+            name='watermarks',
+            field=models.JSONField(default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 09:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0021_site_statistics_watermarks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sitestatistics',
+            name='approximate_fields',
+            field=models.JSONField(default=list, editable=False),
+        ),
+    ]
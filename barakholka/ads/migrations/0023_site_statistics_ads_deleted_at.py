@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 09:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0022_site_statistics_approximate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sitestatistics',
+            name='ads_deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Последнее удаление объявления'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 09:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0023_site_statistics_ads_deleted_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importcheckpoint',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Завершён'),
+        ),
+    ]
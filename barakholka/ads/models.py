@@ -1,7 +1,89 @@
+import time
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.validators import FileExtensionValidator
-from django.db import models
+from django.db import connection, models
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
 from django.conf import settings
 
+from ads.storage import ads_image_storage
+
+
+def _ads_deleted_at():
+    # Отметка удаления хранится в БД, а не в кэше: кэш у каждого процесса свой,
+    # а удаление должно сдвигать Last-Modified ленты во всех воркерах и быть видно
+    # демону update_stats. Подзапрос выполняется один раз в том же запросе
+    return Max(Subquery(SiteStatistics.objects.filter(pk=1).values('ads_deleted_at')))
+
+
+class AdsQuerySet(models.QuerySet):
+    def last_modified(self):
+        """Время последнего изменения объявлений, включая удаления."""
+        values = self.aggregate(updated=Max('updated_at'), deleted=_ads_deleted_at())
+        timestamps = [timestamp for timestamp in values.values() if timestamp]
+        return max(timestamps) if timestamps else None
+
+    def with_main_image(self):
+        """Путь и уменьшенные копии главного изображения через подзапросы."""
+        main_image = AdsImage.objects.filter(ads=OuterRef('pk')).order_by('-is_main', 'order')
+        return self.annotate(
+            card_image_path=Subquery(main_image.values('image')[:1]),
+            card_image_renditions=Subquery(main_image.values('renditions')[:1]),
+        )
+
+    def with_card_data(self):
+        """
+        Данные для карточки объявления одним запросом:
+        продавец и категория через JOIN, главное изображение через подзапрос.
+        """
+        return self.select_related('seller', 'category').defer('search_vector').with_main_image()
+
+
+class CategoryManager(models.Manager):
+    def resolve(self, name):
+        """Находит категорию по названию без учёта регистра и пробелов, при необходимости создаёт."""
+        name = Category.clean_name(name)
+        category, created = self.get_or_create(key=Category.make_key(name), defaults={'name': name})
+        return category
+
+    def refresh_counters(self, ids=None):
+        """Пересчитывает active_ads_count по таблице объявлений (исправляет расхождения)."""
+        categories = self.all() if ids is None else self.filter(pk__in=ids)
+        active_ads = (
+            Ads.objects.filter(category=OuterRef('pk'), available=True)
+            .order_by().values('category').annotate(count=Count('id')).values('count')
+        )
+        return categories.update(active_ads_count=Coalesce(Subquery(active_ads), 0))
+
+
+class Category(models.Model):
+    name = models.CharField(max_length=100, verbose_name="Название")
+    # Нормализованное название: по нему ищем и не допускаем дублей
+    key = models.CharField(max_length=100, unique=True, verbose_name="Ключ")
+    active_ads_count = models.PositiveIntegerField(default=0, verbose_name="Активных объявлений")
+
+    objects = CategoryManager()
+
+    class Meta:
+        verbose_name = "Категория"
+        verbose_name_plural = "Категории"
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+    @staticmethod
+    def clean_name(name):
+        name = ' '.join(name.split())
+        return name[:1].upper() + name[1:]
+
+    @staticmethod
+    def make_key(name):
+        return ' '.join(name.split()).casefold()
+
 
 class Ads(models.Model):
     NEW = 'new'
@@ -21,21 +103,64 @@ class Ads(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Цена")
     address = models.CharField(max_length=500, verbose_name="Адрес")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    # Меняется и при изменении изображений; используется для условных GET-запросов
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Дата изменения")
     available = models.BooleanField(default=True, verbose_name="Доступно")
+    # Денормализованные счётчики: избранное обновляется сигналами, просмотры — пачками (ads.view_counter)
+    favorites_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="В избранном")
+    views_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Просмотров")
     type = models.CharField(max_length=20, choices=TYPE_CHOICES, verbose_name="Состояние")
-    category = models.CharField(max_length=100, help_text='Например: Бытовая техника, Конспекты, Одежда и т.д.', verbose_name="Категория")
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.PROTECT,
+        related_name='ads',
+        verbose_name="Категория"
+    )
+
+    # Поисковый вектор хранится в таблице и пересчитывается самой БД
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('title', weight='A', config='russian')
+            + SearchVector('description', weight='B', config='russian')
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = AdsQuerySet.as_manager()
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Исходные значения нужны для пересчёта Category.active_ads_count
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     @property
     def main_image(self):
+        # Путь уже получен подзапросом в AdsQuerySet.with_card_data()
+        if hasattr(self, 'card_image_path'):
+            if not self.card_image_path:
+                return None
+            field = AdsImage._meta.get_field('image')
+            return field.attr_class(self, field, self.card_image_path)
+
         main = self.images.filter(is_main=True).first()
         if main:
             return main.image
         first_image = self.images.first()
         return first_image.image if first_image else None
 
+    @property
+    def main_image_renditions(self):
+        if hasattr(self, 'card_image_renditions'):
+            return self.card_image_renditions or {}
+        image = self.main_image
+        return image.instance.renditions if image else {}
+
     @property
     def main_image_url(self):
         image = self.main_image
@@ -47,7 +172,18 @@ class Ads(models.Model):
         return self.favorited_by.filter(user=user).exists()
 
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # Частичный индекс под ленту объявлений (ключ курсорной пагинации)
+            models.Index(
+                fields=['-created_at', '-id'],
+                condition=Q(available=True),
+                name='ads_available_feed_idx',
+            ),
+            GinIndex(fields=['search_vector'], name='ads_search_vector_idx'),
+            # Триграммы для поиска с опечатками
+            GinIndex(fields=['title'], opclasses=['gin_trgm_ops'], name='ads_title_trgm_idx'),
+        ]
 
 class AdsImage(models.Model):
     ads = models.ForeignKey(
@@ -57,23 +193,57 @@ class AdsImage(models.Model):
     )
     image = models.ImageField(
         upload_to='ads/images/',
+        storage=ads_image_storage,
         validators=[FileExtensionValidator(allowed_extensions=['jpg', 'jpeg', 'png'])],
     )
     is_main = models.BooleanField(default=False)
     order = models.PositiveIntegerField(default=0)
+    # Уменьшенные копии: {формат: {ширина: путь}}, см. ads.renditions
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return f"Image for {self.ads.title}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_image_name = dict(zip(field_names, values)).get('image')
+        return instance
+
     def save(self, *args, **kwargs):
         if self.is_main:
             AdsImage.objects.filter(ads=self.ads, is_main=True).exclude(id=self.id).update(is_main=False)
+        loaded_image_name = getattr(self, '_loaded_image_name', None)
+        image_changed = self.image.name != loaded_image_name
         super().save(*args, **kwargs)
+        self._loaded_image_name = self.image.name
+        if image_changed and loaded_image_name:
+            # Прежний файл мог использоваться другими объявлениями — хранилище учтёт ссылки
+            self.image.storage.delete(loaded_image_name)
+        if self.image and (image_changed or not self.renditions):
+            # Копии строит воркер очереди; до этого карточки показывают оригинал
+            from ads.jobs import enqueue
+            enqueue('ads.build_renditions', {'image_id': self.pk})
+
+    def refresh_renditions(self):
+        from ads.renditions import save_renditions
+        return save_renditions(self)
 
     class Meta:
         ordering = ['-is_main', 'order']
 
 
+class StoredFile(models.Model):
+    """Файл в ContentAddressedStorage и число ссылок на него."""
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count})"
+
+
 
 class Favorite(models.Model):
     user = models.ForeignKey(
@@ -112,6 +282,15 @@ class SiteStatistics(models.Model):
     total_favorites = models.PositiveIntegerField(default=0, verbose_name='Добавлено в избранное')
 
 
+    # Метки таблиц на момент последнего пересчёта и длительность COUNT-запросов, мс
+    watermarks = models.JSONField(default=dict, editable=False)
+    timings = models.JSONField(default=dict, editable=False)
+    # Счётчики, оценённые по статистике планировщика, а не COUNT(*)
+    approximate_fields = models.JSONField(default=list, editable=False)
+
+    # Когда последний раз удаляли объявление: удаление не оставляет updated_at
+    ads_deleted_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name='Последнее удаление объявления')
+
     # Дата обновления
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
 
@@ -126,23 +305,227 @@ class SiteStatistics(models.Model):
     @classmethod
     def get_current_stats(cls):
         stats, created = cls.objects.get_or_create(pk=1)
+        if created:
+            # Дальше счётчики поддерживаются сигналами, начальные значения — полным пересчётом
+            stats.update_stats()
         return stats
 
-    def update_stats(self):
+    @classmethod
+    def shift(cls, **deltas):
+        """
+        Сдвигает счётчики одним UPDATE без пересчёта таблиц:
+        SiteStatistics.shift(total_ads=1, active_ads=1). Вызывается из сигналов,
+        расхождения исправляет update_stats().
+        """
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        updated = cls.objects.filter(pk=1).update(
+            updated_at=timezone.now(),
+            **{field: Greatest(F(field) + delta, 0) for field, delta in deltas.items()},
+        )
+        if not updated:
+            # Строки ещё нет — её создаст полный пересчёт, он учтёт и это изменение
+            cls.get_current_stats()
+
+    @classmethod
+    def note_ads_deletion(cls):
+        """Запоминает время удаления объявления для Last-Modified ленты и метки таблицы."""
+        if not cls.objects.filter(pk=1).update(ads_deleted_at=timezone.now()):
+            cls.get_current_stats()
+            cls.objects.filter(pk=1).update(ads_deleted_at=timezone.now())
+
+    def _sources(self):
+        """Таблица -> (модель, дополнительные поля метки, {счётчик: выборка})."""
         from chat.models import ChatRoom, Message
         from django.contrib.auth import get_user_model
 
         User = get_user_model()
+        return {
+            'ads': (Ads, {'updated': Max('updated_at'), 'deleted': _ads_deleted_at()}, {
+                'total_ads': Ads.objects.all(),
+                'active_ads': Ads.objects.filter(available=True),
+            }),
+            'users': (User, {}, {'total_users': User.objects.all()}),
+            'chats': (ChatRoom, {}, {'total_chats': ChatRoom.objects.all()}),
+            'messages': (Message, {}, {'total_messages': Message.objects.all()}),
+            'favorites': (Favorite, {}, {'total_favorites': Favorite.objects.all()}),
+        }
+
+    def _watermark(self, table, model, extra):
+        # Максимальный id ловит вставки; у объявлений ещё правки (updated_at) и удаления
+        values = model._default_manager.aggregate(pk=Max('pk'), **extra)
+        return [str(value) for _, value in sorted(values.items())]
+
+    def _approximate_count(self, model):
+        """
+        Оценка числа строк из статистики планировщика (pg_class.reltuples) —
+        только если включён ADS_STATISTICS_APPROXIMATE_COUNTS и таблица не меньше
+        порога ADS_STATISTICS_APPROXIMATE_THRESHOLD. Иначе None: считаем точно.
+        """
+        if not settings.ADS_STATISTICS_APPROXIMATE_COUNTS:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [connection.ops.quote_name(model._meta.db_table)],
+            )
+            row = cursor.fetchone()
+        # -1 — таблицу ещё ни разу не анализировали
+        if row is None or row[0] < settings.ADS_STATISTICS_APPROXIMATE_THRESHOLD:
+            return None
+        return row[0]
+
+    def update_stats(self, only_changed=False):
+        """
+        Пересчитывает счётчики COUNT-запросами и записывает длительность каждого
+        в timings (мс), список пересчитанных — в recounted. Большие таблицы
+        в приблизительном режиме оцениваются по pg_class, такие счётчики
+        перечислены в approximate_fields. С only_changed=True пропускает
+        таблицы, метка которых не изменилась с прошлого пересчёта. Удаления
+        из таблиц, кроме объявлений, метка не замечает — их учитывают сигналы,
+        а полный пересчёт исправит.
+        """
+        updated_fields = []
+        approximate = set(self.approximate_fields)
+        for table, (model, extra, counters) in self._sources().items():
+            watermark = self._watermark(table, model, extra)
+            if only_changed and self.watermarks.get(table) == watermark:
+                continue
+            for field, queryset in counters.items():
+                started = time.monotonic()
+                value = None
+                # Приблизительно можно считать только таблицу целиком, без условий
+                if not queryset.query.has_filters():
+                    value = self._approximate_count(model)
+                if value is None:
+                    value = queryset.count()
+                    approximate.discard(field)
+                else:
+                    approximate.add(field)
+                setattr(self, field, value)
+                self.timings[field] = round((time.monotonic() - started) * 1000, 1)
+                updated_fields.append(field)
+            self.watermarks[table] = watermark
+        self.approximate_fields = sorted(approximate)
+
+        # Сохраняем только пересчитанное, чтобы не затереть сдвиги из сигналов в остальных полях
+        self.save(update_fields=[*updated_fields, 'watermarks', 'timings', 'approximate_fields', 'updated_at'])
+        self.recounted = updated_fields
+
+        return self
+
+
+class DailyStatistics(models.Model):
+    """Снимок активности за сутки, заполняется ads.daily_stats."""
+    date = models.DateField(unique=True, verbose_name='Дата')
+    new_ads = models.PositiveIntegerField(default=0, verbose_name='Новых объявлений')
+    new_users = models.PositiveIntegerField(default=0, verbose_name='Новых пользователей')
+    new_messages = models.PositiveIntegerField(default=0, verbose_name='Сообщений')
+    new_favorites = models.PositiveIntegerField(default=0, verbose_name='Добавлений в избранное')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+
+    class Meta:
+        verbose_name = 'Статистика за день'
+        verbose_name_plural = 'Статистика по дням'
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.date}: объявлений {self.new_ads}, пользователей {self.new_users}"
 
-        self.total_ads = Ads.objects.count()
-        self.active_ads = Ads.objects.filter(available=True).count()
-        self.total_users = User.objects.count()
 
-        self.total_chats = ChatRoom.objects.count()
-        self.total_messages = Message.objects.count()
+class TopSeller(models.Model):
+    """Строка материализованного представления ads_top_sellers, см. ads.leaderboards."""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        related_name='+',
+    )
+    username = models.CharField(max_length=150, verbose_name='Пользователь')
+    ads_count = models.PositiveIntegerField(verbose_name='Объявлений')
 
-        self.total_favorites = Favorite.objects.count()
+    class Meta:
+        managed = False
+        db_table = 'ads_top_sellers'
+        ordering = ['-ads_count', 'username']
+        verbose_name = 'Топ по объявлениям'
+        verbose_name_plural = 'Топ по объявлениям'
 
-        self.save()
 
-        return self
\ No newline at end of file
+class TopMessageSender(models.Model):
+    """Строка материализованного представления ads_top_message_senders, см. ads.leaderboards."""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        related_name='+',
+    )
+    username = models.CharField(max_length=150, verbose_name='Пользователь')
+    messages_count = models.PositiveIntegerField(verbose_name='Сообщений')
+
+    class Meta:
+        managed = False
+        db_table = 'ads_top_message_senders'
+        ordering = ['-messages_count', 'username']
+        verbose_name = 'Топ по сообщениям'
+        verbose_name_plural = 'Топ по сообщениям'
+
+
+class ImportCheckpoint(models.Model):
+    """Сколько строк источника уже импортировано командой import_ads."""
+    name = models.CharField(max_length=255, unique=True, verbose_name='Источник')
+    rows_done = models.PositiveBigIntegerField(default=0, verbose_name='Обработано строк')
+    ads_created = models.PositiveIntegerField(default=0, verbose_name='Создано объявлений')
+    # Источник прочитан до конца: повторный запуск не загружает его снова
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Завершён')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+
+    class Meta:
+        verbose_name = 'Импорт объявлений'
+        verbose_name_plural = 'Импорт объявлений'
+
+    def __str__(self):
+        return f"{self.name}: {self.rows_done}"
+
+
+class Job(models.Model):
+    """Задача фоновой очереди, см. ads.jobs."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    name = models.CharField(max_length=100, verbose_name='Задача')
+    payload = models.JSONField(default=dict, blank=True, verbose_name='Параметры')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, verbose_name='Статус')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')
+    max_attempts = models.PositiveSmallIntegerField(default=5, verbose_name='Максимум попыток')
+    run_at = models.DateTimeField(default=timezone.now, verbose_name='Запустить не раньше')
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name='Взята в работу')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Завершена')
+    duration_ms = models.PositiveIntegerField(null=True, blank=True, verbose_name='Длительность, мс')
+    last_error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создана')
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        ordering = ['-created_at']
+        indexes = [
+            # Выборка воркером: только ожидающие задачи в порядке запуска
+            models.Index(
+                fields=['run_at', 'id'],
+                condition=Q(status='pending'),
+                name='ads_job_pending_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.get_status_display()})"
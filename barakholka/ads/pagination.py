@@ -0,0 +1,123 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class KeysetPage:
+    """Страница выборки, полученная по курсору."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def encode_cursor(values):
+    values = [value.isoformat() if hasattr(value, 'isoformat') else str(value) for value in values]
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size=2):
+    """Возвращает список значений ключа или None, если курсор повреждён."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if not isinstance(values, list) or len(values) != size or not all(isinstance(v, str) for v in values):
+        return None
+    return values
+
+
+class KeysetPaginator:
+    """
+    Пагинация без OFFSET и COUNT(*). Ключ — два поля по убыванию:
+    основное (по умолчанию created_at, как в Ads.Meta.ordering)
+    и уникальный тай-брейк id. Стоимость любой страницы равна стоимости первой.
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-created_at', '-id')):
+        self.key, self.tiebreak = (field.lstrip('-') for field in ordering)
+        self.queryset = queryset.order_by(f'-{self.key}', f'-{self.tiebreak}')
+        self.per_page = per_page
+
+    def _cursor(self, obj):
+        return encode_cursor([getattr(obj, self.key), getattr(obj, self.tiebreak)])
+
+    def row_cursor(self, row):
+        """Курсор для строки из .values()."""
+        return encode_cursor([row[self.key], row[self.tiebreak]])
+
+    def _after(self, after_key):
+        if not after_key:
+            return self.queryset
+        value, pk = after_key
+        return (
+            self.queryset.filter(**{f'{self.key}__lte': value})
+            .filter(Q(**{f'{self.key}__lt': value}) | Q(**{f'{self.tiebreak}__lt': pk}))
+        )
+
+    def queryset_after(self, after=None):
+        """Упорядоченная выборка после курсора — для потоковой выдачи без загрузки страницы в память."""
+        try:
+            return self._after(decode_cursor(after))
+        except (ValidationError, ValueError, TypeError):
+            return self.queryset
+
+    def get_page(self, after=None, before=None):
+        after_key = decode_cursor(after)
+        before_key = decode_cursor(before)
+
+        try:
+            if before_key and not after_key:
+                return self._page_before(*before_key)
+            return self._page_after(after_key)
+        except (ValidationError, ValueError, TypeError):
+            # Значения курсора не приводятся к типам полей — отдаём первую страницу
+            return self._page_after(None)
+
+    def _page_after(self, after_key):
+        rows = list(self._after(after_key)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        return KeysetPage(
+            rows,
+            next_cursor=self._cursor(rows[-1]) if rows and has_more else None,
+            previous_cursor=self._cursor(rows[0]) if rows and after_key else None,
+        )
+
+    def _page_before(self, value, pk):
+        rows = list(
+            self.queryset.filter(**{f'{self.key}__gte': value})
+            .filter(Q(**{f'{self.key}__gt': value}) | Q(**{f'{self.tiebreak}__gt': pk}))
+            .order_by(self.key, self.tiebreak)[:self.per_page + 1]
+        )
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return KeysetPage(
+            rows,
+            next_cursor=self._cursor(rows[-1]) if rows else None,
+            previous_cursor=self._cursor(rows[0]) if rows and has_more else None,
+        )
@@ -0,0 +1,75 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+
+RENDITION_WIDTHS = (320, 640, 1280)
+RENDITION_FORMATS = {
+    # формат -> (формат Pillow, расширение, параметры сохранения)
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 6}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+RENDITIONS_DIR = 'ads/renditions/'
+
+
+def _target_widths(original_width):
+    widths = [width for width in RENDITION_WIDTHS if width < original_width]
+    # Картинка меньше минимальной ширины всё равно получает одну копию
+    return widths + [min(original_width, RENDITION_WIDTHS[-1])]
+
+
+def build_renditions(image_file):
+    """
+    Уменьшенные копии изображения нескольких ширин в WebP и JPEG.
+    Ориентация из EXIF применяется к пикселям, сами метаданные
+    в копии не попадают. Возвращает {формат: {ширина: (имя файла, байты)}}.
+    """
+    image_file.open('rb')
+    try:
+        with Image.open(image_file) as original:
+            original = ImageOps.exif_transpose(original)
+            if original.mode not in ('RGB', 'L'):
+                original = original.convert('RGB')
+            stem = os.path.splitext(os.path.basename(image_file.name))[0]
+
+            result = {fmt: {} for fmt in RENDITION_FORMATS}
+            for width in _target_widths(original.width):
+                height = max(1, round(original.height * width / original.width))
+                resized = original.resize((width, height), Image.Resampling.LANCZOS)
+                for fmt, (pil_format, extension, options) in RENDITION_FORMATS.items():
+                    buffer = BytesIO()
+                    resized.save(buffer, pil_format, **options)
+                    result[fmt][str(width)] = (f'{stem}-{width}.{extension}', buffer.getvalue())
+            return result
+    finally:
+        image_file.close()
+
+
+def save_renditions(ads_image):
+    """Создаёт копии для AdsImage, удаляет прежние и записывает пути в AdsImage.renditions."""
+    storage = ads_image.image.storage
+    renditions = {}
+    for fmt, by_width in build_renditions(ads_image.image).items():
+        renditions[fmt] = {
+            width: storage.save(RENDITIONS_DIR + name, ContentFile(content))
+            for width, (name, content) in by_width.items()
+        }
+
+    delete_renditions(ads_image.renditions, storage)
+    ads_image.renditions = renditions
+    type(ads_image).objects.filter(pk=ads_image.pk).update(renditions=renditions)
+    return renditions
+
+
+def delete_renditions(renditions, storage):
+    for by_width in (renditions or {}).values():
+        for path in by_width.values():
+            storage.delete(path)
+
+
+def rendition_urls(renditions, fmt, storage):
+    """[(url, ширина), ...] по возрастанию ширины."""
+    by_width = (renditions or {}).get(fmt) or {}
+    return [(storage.url(path), int(width)) for width, path in sorted(by_width.items(), key=lambda item: int(item[0]))]
@@ -0,0 +1,35 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast
+
+from ads.models import Category
+
+
+SEARCH_CONFIG = 'russian'
+
+
+def search_ads(queryset, query):
+    """
+    Ранжированный полнотекстовый поиск по Ads.search_vector (GIN-индекс).
+    Категории ищутся по маленькой таблице Category, объявления
+    из найденных категорий получают минимальный ранг.
+    Если ничего не нашлось — нечёткий поиск по триграммам названия,
+    чтобы находить запросы с опечатками.
+    Результат аннотирован полем rank для сортировки по релевантности.
+    Ранг приводится к double precision, чтобы значение из курсора
+    пагинации точно совпадало со значением в БД.
+    """
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+    category_ids = list(
+        Category.objects.annotate(search=SearchVector('name', config=SEARCH_CONFIG))
+        .filter(search=search_query).values_list('id', flat=True)
+    )
+    results = queryset.filter(Q(search_vector=search_query) | Q(category_id__in=category_ids)).annotate(
+        rank=Cast(SearchRank(F('search_vector'), search_query), FloatField()),
+    )
+    if results.exists():
+        return results
+
+    return queryset.filter(title__trigram_word_similar=query).annotate(
+        rank=Cast(TrigramWordSimilarity(query, 'title'), FloatField()),
+    )
@@ -0,0 +1,115 @@
+from django.conf import settings
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from ads.facets import invalidate_facet_counts
+from ads.models import Ads, AdsImage, Category, Favorite, SiteStatistics
+from ads.renditions import delete_renditions
+from chat.models import ChatRoom, Message
+
+
+# Модель -> счётчик SiteStatistics, который она меняет
+SITE_STATISTICS_FIELDS = {
+    settings.AUTH_USER_MODEL.lower(): 'total_users',
+    'chat.chatroom': 'total_chats',
+    'chat.message': 'total_messages',
+    'ads.favorite': 'total_favorites',
+}
+
+
+@receiver([post_save, post_delete], sender=Ads)
+def invalidate_ads_facets(sender, **kwargs):
+    invalidate_facet_counts()
+
+
+@receiver([post_save, post_delete], sender=AdsImage)
+def touch_ad_on_image_change(sender, instance, **kwargs):
+    # По updated_at строятся ключи кэша карточки и страницы объявления
+    Ads.objects.filter(pk=instance.ads_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Favorite)
+def increment_favorites_count(sender, instance, created, **kwargs):
+    if created:
+        Ads.objects.filter(pk=instance.ads_id).update(favorites_count=F('favorites_count') + 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def decrement_favorites_count(sender, instance, **kwargs):
+    Ads.objects.filter(pk=instance.ads_id).update(favorites_count=Greatest(F('favorites_count') - 1, 0))
+
+
+@receiver(post_delete, sender=AdsImage)
+def release_image_files(sender, instance, **kwargs):
+    # Файлы общие для одинаковых фото — хранилище удалит их, когда ссылок не останется
+    storage = instance.image.storage
+    if instance.image.name:
+        storage.delete(instance.image.name)
+    delete_renditions(instance.renditions, storage)
+
+
+@receiver(post_delete, sender=Ads)
+def remember_ad_deletion(sender, **kwargs):
+    # Удалённое объявление не оставляет updated_at — отметка нужна для Last-Modified ленты
+    SiteStatistics.note_ads_deletion()
+
+
+def _shift_active_ads_count(category_id, delta):
+    if category_id:
+        Category.objects.filter(pk=category_id).update(active_ads_count=F('active_ads_count') + delta)
+
+
+@receiver(post_save, sender=Ads)
+def update_counters_on_ads_save(sender, instance, created, **kwargs):
+    """Счётчики категорий и статистики сайта по изменению объявления."""
+    loaded = getattr(instance, '_loaded_values', None)
+    new_category_id = instance.category_id if instance.available else None
+
+    if created:
+        _shift_active_ads_count(new_category_id, 1)
+        SiteStatistics.shift(total_ads=1, active_ads=int(instance.available))
+    elif loaded is None or 'available' not in loaded or 'category_id' not in loaded:
+        # Прежнее состояние неизвестно — пересчитываем категорию целиком,
+        # статистику сайта поправит периодический update_stats
+        Category.objects.refresh_counters(ids=[instance.category_id])
+    else:
+        old_category_id = loaded['category_id'] if loaded['available'] else None
+        if old_category_id != new_category_id:
+            _shift_active_ads_count(old_category_id, -1)
+            _shift_active_ads_count(new_category_id, 1)
+        SiteStatistics.shift(active_ads=int(instance.available) - int(loaded['available']))
+
+    instance._loaded_values = {
+        **(loaded or {}),
+        'available': instance.available,
+        'category_id': instance.category_id,
+    }
+
+
+@receiver(post_delete, sender=Ads)
+def update_counters_on_ads_delete(sender, instance, **kwargs):
+    loaded = getattr(instance, '_loaded_values', None) or {}
+    available = loaded.get('available', instance.available)
+    if available:
+        _shift_active_ads_count(loaded.get('category_id', instance.category_id), -1)
+    SiteStatistics.shift(total_ads=-1, active_ads=-int(available))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_save, sender=ChatRoom)
+@receiver(post_save, sender=Message)
+@receiver(post_save, sender=Favorite)
+def increment_site_statistics(sender, created, **kwargs):
+    if created:
+        SiteStatistics.shift(**{SITE_STATISTICS_FIELDS[sender._meta.label_lower]: 1})
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=ChatRoom)
+@receiver(post_delete, sender=Message)
+@receiver(post_delete, sender=Favorite)
+def decrement_site_statistics(sender, **kwargs):
+    SiteStatistics.shift(**{SITE_STATISTICS_FIELDS[sender._meta.label_lower]: -1})
@@ -0,0 +1,157 @@
+import hashlib
+import os
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+# <каталог>/<2 символа хэша>/<sha256>.<расширение>
+CONTENT_NAME_RE = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{64}(\.[\w]+)?$')
+
+
+def is_content_addressed(name):
+    return bool(name and CONTENT_NAME_RE.search(name))
+
+
+def content_name(directory, digest, extension):
+    return os.path.join(directory, digest[:2], digest + extension.lower()).replace(os.sep, '/')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Файловое хранилище, где имя файла — SHA-256 его содержимого.
+    Одинаковые файлы хранятся один раз, число ссылок на каждый
+    ведётся в таблице StoredFile. delete() уменьшает счётчик и
+    удаляет файл с диска, только когда ссылок не осталось.
+    Имена, записанные до перехода на хранилище, удаляются как обычно.
+    """
+
+    def _save(self, name, content):
+        directory, basename = os.path.split(name)
+        extension = os.path.splitext(basename)[1]
+        target_dir = self.path(directory)
+        os.makedirs(target_dir, exist_ok=True)
+
+        # Хэш считается при копировании во временный файл — один проход по содержимому
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=target_dir, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks(HASH_CHUNK_SIZE):
+                    digest.update(chunk)
+                    tmp.write(chunk)
+            name = content_name(directory, digest.hexdigest(), extension)
+            # Строка счётчика заблокирована, пока файл кладётся на диск и
+            # добавляется ссылка: удаление последней ссылки на тот же файл
+            # либо дождётся нас, либо успеет стереть файл до того, как _store его проверит
+            with transaction.atomic():
+                self._lock_stored_file(name)
+                self._store(tmp_path, name)
+                self.add_reference(name)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        return name
+
+    def _store(self, tmp_path, name):
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            return
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        if self.file_permissions_mode is not None:
+            os.chmod(tmp_path, self.file_permissions_mode)
+        # Замена атомарна; при гонке двух загрузок содержимое всё равно одинаковое
+        os.replace(tmp_path, full_path)
+
+    def adopt(self, name):
+        """
+        Переносит уже лежащий в хранилище файл под имя по содержимому
+        (переименованием, без копирования). Если такой файл уже есть,
+        дубликат удаляется. Возвращает (новое имя, был ли это дубликат).
+        Ссылку не добавляет.
+        """
+        directory, basename = os.path.split(name)
+        full_path = self.path(name)
+        digest = hashlib.sha256()
+        with open(full_path, 'rb') as f:
+            while chunk := f.read(HASH_CHUNK_SIZE):
+                digest.update(chunk)
+        new_name = content_name(directory, digest.hexdigest(), os.path.splitext(basename)[1])
+        new_path = self.path(new_name)
+        if os.path.exists(new_path):
+            os.remove(full_path)
+            return new_name, True
+        os.makedirs(os.path.dirname(new_path), exist_ok=True)
+        os.replace(full_path, new_path)
+        return new_name, False
+
+    def get_available_name(self, name, max_length=None):
+        # Итоговое имя определяется содержимым в _save(), суффиксы не нужны
+        return name
+
+    def _lock_stored_file(self, name):
+        """Блокирует строку StoredFile до конца транзакции, при необходимости создавая её."""
+        from ads.models import StoredFile
+
+        stored = StoredFile.objects.select_for_update().filter(name=name).first()
+        if stored is not None:
+            return stored
+        try:
+            with transaction.atomic():
+                return StoredFile.objects.create(name=name, size=0, ref_count=0)
+        except IntegrityError:
+            return StoredFile.objects.select_for_update().get(name=name)
+
+    def add_reference(self, name, count=1):
+        from ads.models import StoredFile
+
+        with transaction.atomic():
+            stored = self._lock_stored_file(name)
+            StoredFile.objects.filter(pk=stored.pk).update(
+                ref_count=F('ref_count') + count, size=self.size(name),
+            )
+
+    def delete(self, name):
+        if not name:
+            raise ValueError('The name must be given to delete().')
+        if not is_content_addressed(name):
+            return super().delete(name)
+
+        from ads.models import StoredFile
+
+        with transaction.atomic():
+            stored = StoredFile.objects.select_for_update().filter(name=name).first()
+            if stored is None:
+                # Счётчика нет — неизвестно, кто ещё ссылается на файл, поэтому не трогаем его
+                return
+            if stored.ref_count == 0:
+                # Последняя ссылка уже снята, файл удаляется
+                return
+            StoredFile.objects.filter(pk=stored.pk).update(ref_count=F('ref_count') - 1)
+            if stored.ref_count == 1:
+                # Строка с нулевым счётчиком остаётся до удаления файла: на ней
+                # _delete_unreferenced и загрузки того же файла берут блокировку
+                transaction.on_commit(lambda: self._delete_unreferenced(name))
+
+    def _delete_unreferenced(self, name):
+        from ads.models import StoredFile
+
+        with transaction.atomic():
+            stored = StoredFile.objects.select_for_update().filter(name=name).first()
+            # Пока транзакция фиксировалась, тот же файл мог быть загружен заново
+            if stored is None or stored.ref_count > 0:
+                return
+            super().delete(name)
+            stored.delete()
+
+
+def ads_image_storage():
+    return ContentAddressedStorage()
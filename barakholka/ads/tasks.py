@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.utils import timezone
+
+from ads.daily_stats import rollup_recent
+from ads.jobs import task
+from ads.leaderboards import refresh_leaderboards as refresh_leaderboard_views
+from ads.models import Ads, AdsImage
+
+
+@task('ads.build_renditions')
+def build_renditions(image_id):
+    image = AdsImage.objects.filter(pk=image_id).first()
+    if image is None or not image.image:
+        # Изображение успели удалить — делать нечего
+        return
+    image.refresh_renditions()
+    # Копии записываются через update(), поэтому updated_at обновляем сами. По нему
+    # строятся ключи кэша карточки и страницы, так что изменение увидят и веб-процессы
+    Ads.objects.filter(pk=image.ads_id).update(updated_at=timezone.now())
+
+
+@task('ads.rollup_daily_statistics', every=lambda: settings.ADS_STATISTICS_ROLLUP_INTERVAL)
+def rollup_daily_statistics():
+    rollup_recent()
+
+
+@task('ads.refresh_leaderboards', every=lambda: settings.ADS_LEADERBOARDS_REFRESH_INTERVAL)
+def refresh_leaderboards():
+    refresh_leaderboard_views()
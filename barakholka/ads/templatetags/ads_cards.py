@@ -0,0 +1,19 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from ads.card_cache import render_cards
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def ad_cards(ads):
+    """Карточки объявлений из кэша фрагментов (см. ads.card_cache)."""
+    return mark_safe(render_cards(ads))
+
+
+@register.filter
+def id_list(ids):
+    """Множество id -> отсортированный список (для json_script)."""
+    return sorted(ids or ())
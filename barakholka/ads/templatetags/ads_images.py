@@ -0,0 +1,30 @@
+from django import template
+
+from ads.models import AdsImage
+from ads.renditions import rendition_urls
+
+
+register = template.Library()
+
+# Ширина копии для атрибута src, если браузер не понимает srcset
+FALLBACK_WIDTH = 640
+
+
+def _storage():
+    return AdsImage._meta.get_field('image').storage
+
+
+@register.filter
+def srcset(renditions, fmt='webp'):
+    """{{ image.renditions|srcset:'webp' }} -> 'url 320w, url 640w, ...'"""
+    return ', '.join(f'{url} {width}w' for url, width in rendition_urls(renditions, fmt, _storage()))
+
+
+@register.filter
+def rendition_src(renditions, fmt='jpeg'):
+    """Копия не шире FALLBACK_WIDTH (или самая узкая) для атрибута src."""
+    urls = rendition_urls(renditions, fmt, _storage())
+    if not urls:
+        return ''
+    suitable = [url for url, width in urls if width <= FALLBACK_WIDTH]
+    return suitable[-1] if suitable else urls[0][0]
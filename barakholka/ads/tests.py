@@ -1,3 +1,184 @@
-from django.test import TestCase
+import json
+import tempfile
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ads.models import Ads, AdsImage, Category, Favorite, StoredFile
+from ads.storage import ContentAddressedStorage
+from user.models import Role, User
+
+
+# Просмотры не должны сбрасываться в БД посреди подсчёта запросов
+@override_settings(ADS_VIEWS_FLUSH_INTERVAL=3600)
+class AdDetailQueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        role = Role.objects.create(name='Продавец')
+        cls.seller = User.objects.create_user('seller', password='pass', role=role)
+        cls.buyer = User.objects.create_user('buyer', password='pass', role=role)
+        cls.ad = Ads.objects.create(
+            seller=cls.seller,
+            title='Велосипед',
+            description='Почти новый',
+            price=1000,
+            address='Москва',
+            type=Ads.USED,
+            category=Category.objects.resolve('Спорт'),
+        )
+        for order in range(1, 4):
+            AdsImage.objects.create(ads=cls.ad, image=f'ads/images/photo{order}.jpg', order=order, is_main=order == 1)
+        cls.url = reverse('ads:ads_detail', args=[cls.ad.pk])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cold_cache_uses_version_ad_and_images_queries(self):
+        # updated_at по первичному ключу, объявление с JOIN, изображения
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'data-bs-slide-to="2"')
+
+    def test_warm_cache_only_checks_version(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Велосипед')
+
+    def test_authenticated_user_adds_only_session_and_favorite_queries(self):
+        Favorite.objects.create(user=self.buyer, ads=self.ad)
+        self.client.force_login(self.buyer)
+        self.client.get(self.url)
+        # сессия, пользователь, версия объявления, избранное
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Убрать из избранного')
+
+    def test_edit_invalidates_cached_page(self):
+        self.client.get(self.url)
+        ad = Ads.objects.get(pk=self.ad.pk)
+        ad.title = 'Самокат'
+        ad.save()
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Самокат')
+
+    def test_missing_ad_returns_404(self):
+        response = self.client.get(reverse('ads:ads_detail', args=[self.ad.pk + 1000]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_missing_ad_costs_one_query(self):
+        missing_id = self.ad.pk + 1000
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('ads:ads_detail', args=[missing_id]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_change_from_another_process_invalidates_cached_page(self):
+        etag = self.client.get(self.url)['ETag']
+        # Так объявление меняет другой воркер: сигналы этого процесса не срабатывают
+        Ads.objects.filter(pk=self.ad.pk).update(title='Самокат', updated_at=timezone.now())
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Самокат')
+
+
+class AdCardCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        role = Role.objects.create(name='Продавец')
+        seller = User.objects.create_user('seller', password='pass', role=role)
+        cls.ad = Ads.objects.create(
+            seller=seller,
+            title='Велосипед',
+            price=1000,
+            address='Москва',
+            type=Ads.USED,
+            category=Category.objects.resolve('Спорт'),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_change_without_signals_renders_new_card(self):
+        self.assertContains(self.client.get(reverse('ads:ads_list')), 'Велосипед')
+        # Так объявление меняет другой процесс (run_jobs): сигналы этого процесса не срабатывают
+        Ads.objects.filter(pk=self.ad.pk).update(title='Самокат', updated_at=timezone.now())
+        response = self.client.get(reverse('ads:ads_list'))
+        self.assertContains(response, 'Самокат')
+        self.assertNotContains(response, 'Велосипед')
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        self.storage = ContentAddressedStorage(location=tempfile.mkdtemp())
+
+    def test_upload_before_deferred_delete_keeps_file(self):
+        name = self.storage.save('ads/a.txt', ContentFile(b'data'))
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.storage.delete(name)
+        # Тот же файл загружен заново, пока удаление ждало фиксации транзакции
+        self.assertEqual(self.storage.save('ads/b.txt', ContentFile(b'data')), name)
+        for callback in callbacks:
+            callback()
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(StoredFile.objects.get(name=name).ref_count, 1)
+
+    def test_last_reference_deletes_file(self):
+        name = self.storage.save('ads/a.txt', ContentFile(b'data'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.storage.delete(name)
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+
+class AdsListValidatorsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        role = Role.objects.create(name='Продавец')
+        seller = User.objects.create_user('seller', password='pass', role=role)
+        category = Category.objects.resolve('Спорт')
+        cls.ads = [
+            Ads.objects.create(seller=seller, title=title, price=1000, address='Москва', type=Ads.USED, category=category)
+            for title in ('Велосипед', 'Самокат')
+        ]
+
+    def test_deletion_changes_etag_for_every_process(self):
+        etag = self.client.get(reverse('ads:ads_list'))['ETag']
+        # Последнее изменённое объявление остаётся, Max(updated_at) не сдвигается
+        self.ads[0].delete()
+        # Локальный кэш другого воркера ничего не знает об удалении
+        cache.clear()
+        response = self.client.get(reverse('ads:ads_list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'Велосипед')
+
+
+class ApiAdsListStreamingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        role = Role.objects.create(name='Продавец')
+        seller = User.objects.create_user('seller', password='pass', role=role)
+        category = Category.objects.resolve('Спорт')
+        for number in range(3):
+            Ads.objects.create(
+                seller=seller, title=f'Велосипед {number}', price=1000,
+                address='Москва', type=Ads.USED, category=category,
+            )
+
+    def test_wsgi_streams_sync_iterator(self):
+        response = self.client.get(reverse('ads:api_ads_list'), {'limit': 2})
+        self.assertFalse(response.is_async)
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(data['results']), 2)
+        self.assertIsNotNone(data['next'])
+
+    async def test_asgi_streams_async_iterator(self):
+        # Синхронный итератор ASGI-обработчик собрал бы в память целиком
+        response = await self.async_client.get(reverse('ads:api_ads_list'), {'limit': 2})
+        self.assertTrue(response.is_async)
+        data = json.loads(b''.join([chunk async for chunk in response.streaming_content]))
+        self.assertEqual(len(data['results']), 2)
+        self.assertIsNotNone(data['next'])
@@ -1,8 +1,9 @@
 from django.urls import path
 from ads.views import (ads_list, ads_detail, ad_create,
                        ad_edit, ad_delete,
-                       add_to_favorites, remove_from_favorites, favorites_list,
+                       favorite_toggle, favorites_list,
                        site_statistics, my_ads)
+from ads.api import api_ads_list, api_ads_detail
 
 
 app_name = 'ads'
@@ -21,11 +22,13 @@ urlpatterns = [
 
     path('favorites/', favorites_list, name='favorites_list'),
 
-    path('<int:ad_id>/add-to-favorites/', add_to_favorites, name='add_to_favorites'),
-
-    path('<int:ad_id>/remove-from-favorites/', remove_from_favorites, name='remove_from_favorites'),
+    path('<int:ad_id>/favorite/', favorite_toggle, name='favorite_toggle'),
 
     path('statistics/', site_statistics, name='site_statistics'),
 
     path('my-ads/', my_ads, name='my_ads'),
+
+    path('api/ads/', api_ads_list, name='api_ads_list'),
+
+    path('api/ads/<int:ad_id>/', api_ads_detail, name='api_ads_detail'),
 ]
\ No newline at end of file
@@ -0,0 +1,111 @@
+import atexit
+import os
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+from django.db.models import Case, F, IntegerField, Value, When
+
+from ads.models import Ads
+
+
+# Сколько разных объявлений можно накопить до внеочередной записи
+MAX_PENDING_ADS = 1000
+
+_pending = Counter()
+_lock = threading.Lock()
+_last_flush = time.monotonic()
+# PID процесса, в котором запущен фоновый поток записи (после fork потока нет)
+_flusher_pid = None
+
+
+def record_view(ad_id):
+    """
+    Учитывает просмотр в памяти процесса. В БД просмотры попадают
+    одним UPDATE на пачку объявлений раз в ADS_VIEWS_FLUSH_INTERVAL секунд,
+    поэтому популярное объявление не становится точкой блокировок.
+    """
+    _start_flusher()
+    with _lock:
+        _pending[ad_id] += 1
+        due = (
+            time.monotonic() - _last_flush >= settings.ADS_VIEWS_FLUSH_INTERVAL
+            or len(_pending) >= MAX_PENDING_ADS
+        )
+    if due:
+        try:
+            flush_views()
+        except DatabaseError:
+            # Просмотры остались в памяти и будут записаны при следующей попытке
+            pass
+
+
+def flush_views():
+    """Записывает накопленные просмотры. Возвращает число обновлённых объявлений."""
+    global _last_flush
+    with _lock:
+        batch = dict(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+    if not batch:
+        return 0
+
+    # Один UPDATE на всю пачку вместо отдельного запроса на каждый просмотр
+    ad_ids = sorted(batch)
+    try:
+        return Ads.objects.filter(pk__in=ad_ids).update(
+            views_count=F('views_count') + Case(
+                *[When(pk=ad_id, then=Value(batch[ad_id])) for ad_id in ad_ids],
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        )
+    except DatabaseError:
+        # Не теряем просмотры из-за временной ошибки БД — вернём их в очередь
+        with _lock:
+            _pending.update(batch)
+        raise
+
+
+def _start_flusher():
+    """Запускает в текущем процессе поток, который пишет просмотры по таймеру."""
+    global _flusher_pid
+    pid = os.getpid()
+    if _flusher_pid == pid:
+        return
+    with _lock:
+        if _flusher_pid == pid:
+            return
+        _flusher_pid = pid
+    threading.Thread(target=_flush_periodically, name='ads-views-flusher', daemon=True).start()
+
+
+def _flush_periodically():
+    # Без потока просмотры редко открываемых объявлений висели бы в памяти
+    # до следующего просмотра или до остановки процесса
+    while True:
+        time.sleep(settings.ADS_VIEWS_FLUSH_INTERVAL)
+        if time.monotonic() - _last_flush < settings.ADS_VIEWS_FLUSH_INTERVAL:
+            continue
+        try:
+            flush_views()
+        except DatabaseError:
+            pass
+        finally:
+            # У потока своё соединение с БД, закрываем его по правилам CONN_MAX_AGE
+            close_old_connections()
+
+
+def pending_views():
+    with _lock:
+        return dict(_pending)
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        flush_views()
+    except DatabaseError:
+        pass
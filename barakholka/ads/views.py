@@ -1,23 +1,126 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.decorators.http import condition, require_POST
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from ads.models import Ads, Favorite, SiteStatistics
 from django.contrib.auth.decorators import login_required
 from ads.forms import AdsForm, AdsImageFormSet
+from ads.card_cache import card_cache_stats
+from ads.daily_stats import history
+from ads.detail_cache import get_ad_detail
+from ads.favorites import favorite_ids, favorites_version
+from ads.facets import apply_filters, build_facets, get_facet_counts, parse_filters
+from ads.leaderboards import top_message_senders, top_sellers
+from ads.pagination import KeysetPaginator
+from ads.search import search_ads
+from ads.view_counter import record_view
+from django.db import transaction
 from django.db.models import Count
-from chat.models import ChatRoom, Message
 
 
+def _page_validators(request, timestamp, *extra):
+    """
+    ETag и Last-Modified страницы по времени изменения данных.
+    Страница зависит от пользователя, поэтому он входит в ETag,
+    а Last-Modified отдаётся только анонимам. Пока есть непоказанные
+    сообщения, ответ 304 недопустим.
+    """
+    if timestamp is None or len(messages.get_messages(request)):
+        return None, None
+    user_key = request.user.pk if request.user.is_authenticated else 'anon'
+    raw = ':'.join(str(part) for part in (timestamp.isoformat(), user_key, *extra))
+    etag = hashlib.md5(raw.encode()).hexdigest()
+    return etag, None if request.user.is_authenticated else timestamp
+
+
+def _list_validators(request):
+    if not hasattr(request, '_ads_validators'):
+        # Сердечки на карточках зависят от избранного пользователя
+        request._ads_validators = _page_validators(
+            request, Ads.objects.last_modified(), favorites_version(request.user),
+        )
+    return request._ads_validators
+
+
+def _get_detail_ad(request, ad_id):
+    # Валидаторы и сама страница берут объявление из одного места — кэша страницы
+    if not hasattr(request, '_detail_ad'):
+        request._detail_ad = get_ad_detail(ad_id)
+    return request._detail_ad
+
+
+def _detail_validators(request, ad_id):
+    if not hasattr(request, '_ads_validators'):
+        ad = _get_detail_ad(request, ad_id)
+        timestamp = ad.updated_at if ad is not None else None
+        favorited = timestamp is not None and ad_id in favorite_ids(request, [ad_id])
+        request._ads_validators = _page_validators(request, timestamp, favorited)
+    return request._ads_validators
+
+
+@condition(
+    etag_func=lambda request: _list_validators(request)[0],
+    last_modified_func=lambda request: _list_validators(request)[1],
+)
 def ads_list(request):
     all_ads = Ads.objects.filter(available=True)
+
+    search_query = request.GET.get('q', '').strip()
+    if search_query:
+        all_ads = search_ads(all_ads, search_query)
+
+    filters = parse_filters(request.GET)
+    facet_data = get_facet_counts(all_ads, filters, search_query)
+    all_ads = apply_filters(all_ads, filters).with_card_data()
+
+    if search_query:
+        paginator = KeysetPaginator(all_ads, settings.ADS_PAGE_SIZE, ordering=('-rank', '-id'))
+    else:
+        paginator = KeysetPaginator(all_ads, settings.ADS_PAGE_SIZE)
+    page = paginator.get_page(after=request.GET.get('after'), before=request.GET.get('before'))
+
+    # Остальные параметры запроса сохраняем в ссылках пагинации
+    query = request.GET.copy()
+    query.pop('after', None)
+    query.pop('before', None)
+
     return render(request, 'ads_list.html', context={
-        'all_ads': all_ads
+        'all_ads': page,
+        'favorite_ids': favorite_ids(request, [ad.pk for ad in page]),
+        'search_query': search_query,
+        'filters': filters,
+        'facets': build_facets(facet_data, filters, request.GET),
+        'pagination_query': query.urlencode(),
     })
 
+
 def ads_detail(request, ad_id):
-    ad_from_db = get_object_or_404(Ads, id=ad_id)
+    # Просмотр учитываем до проверки условного запроса:
+    # ответ 304 из кэша браузера — тоже просмотр
+    ad_from_db = _get_detail_ad(request, ad_id)
+    if ad_from_db is not None and ad_from_db.seller_id != request.user.pk:
+        record_view(ad_from_db.pk)
+    return _ads_detail_page(request, ad_id)
+
+
+@condition(
+    etag_func=lambda request, ad_id: _detail_validators(request, ad_id)[0],
+    last_modified_func=lambda request, ad_id: _detail_validators(request, ad_id)[1],
+)
+def _ads_detail_page(request, ad_id):
+    ad_from_db = _get_detail_ad(request, ad_id)
+    if ad_from_db is None:
+        raise Http404('Объявление не найдено')
     return render(request, 'ad_detail.html', context={
         'ad': ad_from_db,
+        'favorite_ids': favorite_ids(request, [ad_from_db.pk]),
     })
 
 
@@ -36,10 +139,11 @@ def ad_create(request):
             else:
                 messages.error(request, 'Необходимо войти в систему для создания объявления.')
                 return redirect("user:login")
-            ad.save()
-
-            image_formset.instance = ad
-            image_formset.save()
+            # Обработка изображений ставится в очередь в той же транзакции
+            with transaction.atomic():
+                ad.save()
+                image_formset.instance = ad
+                image_formset.save()
 
             messages.success(request, f'Объявление "{ad.title}" успешно создано!')
             return redirect("ads:ads_list")
@@ -80,8 +184,9 @@ def ad_edit(request, ad_id):
         form = AdsForm(request.POST, request.FILES, instance=ad)
         image_formset = AdsImageFormSet(request.POST, request.FILES, instance=ad)
         if form.is_valid() and image_formset.is_valid():
-            form.save()
-            image_formset.save()
+            with transaction.atomic():
+                form.save()
+                image_formset.save()
             messages.success(request, 'Объявление успешно обновлено!')
             return redirect("ads:ads_detail", ad_id=ad_id)
         else:
@@ -127,97 +232,60 @@ def ad_delete(request, ad_id):
 
     return render(request, "ad_confirm_delete.html", context={"ad": ad})
 
-@login_required
-def add_to_favorites(request, ad_id):
-    ad = get_object_or_404(Ads, id=ad_id)
-
-    if request.user == ad.seller:
-        messages.warning(request, 'Нельзя добавить в избранное свой собственный товар.')
+@require_POST
+def favorite_toggle(request, ad_id):
+    """
+    Добавляет объявление в избранное или убирает из него.
+    AJAX-запросам отвечает JSON, обычная форма возвращает на страницу next.
+    """
+    wants_json = request.headers.get('x-requested-with') == 'XMLHttpRequest'
+    if not request.user.is_authenticated:
+        if wants_json:
+            return JsonResponse({'error': 'Необходимо войти в систему.'}, status=401)
+        return redirect_to_login(request.get_full_path())
+
+    ad = get_object_or_404(Ads.objects.only('id', 'title', 'seller_id'), id=ad_id)
+    if ad.seller_id == request.user.pk:
+        message = 'Нельзя добавить в избранное свой собственный товар.'
+        if wants_json:
+            return JsonResponse({'error': message}, status=400)
+        messages.warning(request, message)
         return redirect('ads:ads_detail', ad_id=ad_id)
 
-    favorite, created = Favorite.objects.get_or_create(
-        user=request.user,
-        ads=ad
-    )
-
-    if created:
-        messages.success(request, f'Товар "{ad.title}" добавлен в избранное!')
+    deleted, _ = Favorite.objects.filter(user=request.user, ads=ad).delete()
+    if deleted:
+        favorited = False
+        message = f'Товар "{ad.title}" удален из избранного.'
     else:
-        messages.info(request, 'Этот товар уже в вашем избранном.')
-
-    return redirect('ads:ads_detail', ad_id=ad_id)
-
-
-@login_required
-def remove_from_favorites(request, ad_id):
-    ad = get_object_or_404(Ads, id=ad_id)
+        Favorite.objects.get_or_create(user=request.user, ads=ad)
+        favorited = True
+        message = f'Товар "{ad.title}" добавлен в избранное!'
 
-    try:
-        favorite = Favorite.objects.get(user=request.user, ads=ad)
-        favorite.delete()
-        messages.success(request, f'Товар "{ad.title}" удален из избранного.')
-    except Favorite.DoesNotExist:
-        messages.warning(request, 'Этот товар не был в избранном.')
+    if wants_json:
+        return JsonResponse({'favorited': favorited, 'message': message})
 
-    next_url = request.GET.get('next', 'ads:favorites_list')
+    messages.success(request, message)
+    next_url = request.POST.get('next') or request.GET.get('next')
+    if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}, require_https=request.is_secure()):
+        next_url = reverse('ads:ads_detail', args=[ad_id])
     return redirect(next_url)
 
 
 @login_required
 def favorites_list(request):
-    favorites = Favorite.objects.filter(user=request.user).select_related('ad', 'ad__seller')
-
-    context = {
-        'favorites': favorites,
-        'favorites_count': favorites.count(),
-    }
-
-    return render(request, 'favorites.html', context)
-
-@login_required
-def add_to_favorites(request, ad_id):
-    ad = get_object_or_404(Ads, id=ad_id)
-
-    if request.user == ad.seller:
-        return redirect("ads:ads_detail", ad_id=ad_id)
-
-    favorite, created = Favorite.objects.get_or_create(
-        user=request.user,
-        ads=ad
-    )
-
-    if created:
-        messages.success(request, f"Товар {ad.title} добавлен в избранное")
-    else:
-        messages.info(request, "Товар уже добавлен в ваше избранное")
-
-    return redirect("ads:ads_detail", ad_id=ad_id)
-
-@login_required
-def remove_from_favorites(request, ad_id):
-    ad = get_object_or_404(Ads, id=ad_id)
-
-    try:
-        favorite = Favorite.objects.get(user=request.user, ads=ad)
-        favorite.delete()
-        messages.success(request, f"Товар '{ad.title}' удален из избранного")
-    except Favorite.DoesNotExist:
-        messages.warning(request, "Этот товар не был в избранном")
-
-    next_url = request.GET.get('next', 'ads:favorites_list')
-    return redirect(next_url)
-
-
-@login_required
-def favorites_list(request):
-    favorites = Favorite.objects.filter(user=request.user).select_related('ads', 'ads__seller')
+    favorites = list(Favorite.objects.filter(user=request.user).select_related('ads', 'ads__seller', 'ads__category'))
 
     return render(request, "ads/favorites.html", context={
         "favorites": favorites,
-        "favorites_count": favorites.count(),
+        "favorites_count": len(favorites),
+        "favorite_ids": {favorite.ads_id for favorite in favorites},
     })
 
 
+# Сколько последних дней показывать на графике
+STATISTICS_HISTORY_DAYS = 90
+
+
 @login_required
 def site_statistics(request):
     """Статистика сайта для администраторов"""
@@ -226,21 +294,22 @@ def site_statistics(request):
         messages.error(request, 'У вас нет прав для просмотра статистики.')
         return redirect('ads:ads_list')
 
-    # Получаем текущую статистику
+    # Счётчики поддерживаются сигналами — здесь только чтение одной строки
     stats = SiteStatistics.get_current_stats()
 
-    # Обновляем статистику перед показом
-    stats.update_stats()
-
-    # Топ пользователей по количеству объявлений
-    top_users_by_ads = Ads.objects.values('seller__username').annotate(
-        ads_count=Count('id')
-    ).order_by('-ads_count')[:10]
-
-    # Топ пользователей по количеству сообщений
-    top_users_by_messages = Message.objects.values('sender__username').annotate(
-        messages_count=Count('id')
-    ).order_by('-messages_count')[:10]
+    # Топы читаются из материализованных представлений (refresh_leaderboards) по индексу
+    top_users_by_ads = top_sellers()
+    top_users_by_messages = top_message_senders()
+
+    # Дневные снимки готовит rollup_statistics — читаем последние дни небольшой таблицы
+    daily = history(STATISTICS_HISTORY_DAYS)
+    history_chart = {
+        'labels': [snapshot.date.strftime('%d.%m') for snapshot in daily],
+        'new_ads': [snapshot.new_ads for snapshot in daily],
+        'new_users': [snapshot.new_users for snapshot in daily],
+        'new_messages': [snapshot.new_messages for snapshot in daily],
+        'new_favorites': [snapshot.new_favorites for snapshot in daily],
+    }
 
     # Рассчитанные метрики для шаблона
     avg_ads_per_user = stats.total_ads / stats.total_users if stats.total_users > 0 else 0
@@ -254,6 +323,8 @@ def site_statistics(request):
         'avg_ads_per_user': avg_ads_per_user,
         'avg_messages_per_chat': avg_messages_per_chat,
         'active_ads_percentage': active_ads_percentage,
+        'card_cache': card_cache_stats(),
+        'history_chart': history_chart,
     }
 
     return render(request, 'statistics.html', context)
@@ -261,11 +332,13 @@ def site_statistics(request):
 
 @login_required
 def my_ads(request):
-    user_ads = Ads.objects.filter(seller=request.user).select_related('seller').order_by('-created_at')
+    user_ads = Ads.objects.filter(seller=request.user).with_card_data().annotate(
+        chats_count=Count('chats'),
+    ).order_by('-created_at', '-id')
 
     context = {
         'user_ads': user_ads,
     }
 
-    return render(request, 'my_ads.html', context)
+    return render(request, 'ads/my_ads.html', context)
 
@@ -0,0 +1,88 @@
+import math
+import random
+import time
+
+from django.core.cache import cache
+
+
+# Значение «пересчёт не выполнялся» (None — допустимое закэшированное значение)
+_MISSING = object()
+
+LOCK_POLL_INTERVAL = 0.05
+
+
+def _lock_key(key):
+    return f'{key}:lock'
+
+
+def _compute_and_store(key, compute, timeout, stale_ttl):
+    started = time.monotonic()
+    value = compute()
+    delta = time.monotonic() - started
+    # Запись живёт дольше срока свежести — на это время её можно отдавать устаревшей
+    cache.set(key, (value, delta, time.time() + timeout), timeout + stale_ttl)
+    return value
+
+
+def _rebuild_single_flight(key, compute, timeout, stale_ttl, lock_timeout):
+    """Пересчитывает значение, только если удалось взять блокировку; иначе _MISSING."""
+    lock_key = _lock_key(key)
+    if not cache.add(lock_key, 1, lock_timeout):
+        return _MISSING
+    try:
+        return _compute_and_store(key, compute, timeout, stale_ttl)
+    finally:
+        cache.delete(lock_key)
+
+
+def get_or_compute(key, compute, timeout, stale_ttl=None, beta=1.0, lock_timeout=30, wait_timeout=5):
+    """
+    Кэш с защитой от одновременного пересчёта («stampede»).
+
+    - Свежее значение изредка пересчитывается заранее: вероятность растёт
+      по мере приближения к сроку и с длительностью прошлого пересчёта
+      (алгоритм XFetch, параметр beta).
+    - Пересчитывает один процесс — тот, кто взял блокировку через cache.add();
+      остальные в это время отдают прежнее значение.
+    - После срока свежести значение ещё stale_ttl секунд отдаётся устаревшим,
+      пока его пересчитывает владелец блокировки (stale-while-revalidate).
+    - При пустом кэше без блокировки ждём чужой пересчёт не дольше wait_timeout.
+
+    Работает с любым бэкендом Django. В файловом и локальном кэше add()
+    атомарен только в пределах процесса, так что между процессами защита
+    лишь снижает число одновременных пересчётов.
+    """
+    if stale_ttl is None:
+        stale_ttl = timeout
+
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expires_at = entry
+        now = time.time()
+        if now - delta * beta * math.log(1.0 - random.random()) < expires_at:
+            return value
+        # Досрочное обновление или устаревшее значение: пересчитывает кто-то один
+        fresh = _rebuild_single_flight(key, compute, timeout, stale_ttl, lock_timeout)
+        return value if fresh is _MISSING else fresh
+
+    fresh = _rebuild_single_flight(key, compute, timeout, stale_ttl, lock_timeout)
+    if fresh is not _MISSING:
+        return fresh
+
+    deadline = time.monotonic() + wait_timeout
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+        if cache.get(_lock_key(key)) is None:
+            # Блокировку отпустили без результата (ошибка пересчёта) — пробуем сами
+            fresh = _rebuild_single_flight(key, compute, timeout, stale_ttl, lock_timeout)
+            if fresh is not _MISSING:
+                return fresh
+    # Владелец блокировки не успел — считаем сами, чтобы не отдавать ошибку
+    return _compute_and_store(key, compute, timeout, stale_ttl)
+
+
+def invalidate(key):
+    cache.delete(key)
@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'ads.apps.AdsConfig',
     'user.apps.UserConfig',
     'chat'
@@ -74,6 +75,9 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'barakholka.wsgi.application'
+# Рабочий запуск — под ASGI (uvicorn, см. README): поток событий чата держит
+# соединение открытым, под WSGI каждое такое соединение заняло бы поток воркера
+ASGI_APPLICATION = 'barakholka.asgi.application'
 
 
 # Database
@@ -134,3 +138,26 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 LOGIN_URL = "user:login"
 LOGIN_REDIRECT_URL = "ads:ads_list"
+
+# Количество объявлений на странице ленты
+ADS_PAGE_SIZE = 24
+
+# Просмотры объявлений копятся в памяти процесса и записываются в БД не чаще, чем раз в N секунд
+ADS_VIEWS_FLUSH_INTERVAL = 30
+
+# Как часто фоновая задача досчитывает дневную статистику, секунды
+ADS_STATISTICS_ROLLUP_INTERVAL = 3600
+
+# Как часто фоновая задача пересчитывает топы пользователей на странице статистики, секунды
+ADS_LEADERBOARDS_REFRESH_INTERVAL = 300
+
+# Большие таблицы на странице статистики можно оценивать по статистике PostgreSQL вместо COUNT(*)
+ADS_STATISTICS_APPROXIMATE_COUNTS = False
+# С какого числа строк (по pg_class.reltuples) таблица считается приблизительно
+ADS_STATISTICS_APPROXIMATE_THRESHOLD = 1_000_000
+
+# Брокер событий чата: внутри процесса — для одного ASGI-сервера, для нескольких узлов подменяется
+CHAT_BROKER = 'chat.realtime.InProcessBroker'
+# Доставлять события чата потоком Server-Sent Events. Действует только под ASGI:
+# под WSGI (в том числе runserver) страница чата всегда опрашивает сервер long-poll
+CHAT_SSE_ENABLED = env.bool('CHAT_SSE_ENABLED', default=True)
@@ -0,0 +1,23 @@
+import uuid
+
+from django.core.cache import cache
+
+
+# Список чатов почти не меняется между сообщениями — версия пользователя сменяется при каждом изменении
+CHAT_LIST_CACHE_TIMEOUT = 60 * 5
+
+
+def _version_key(user_id):
+    return f'chat:list:version:{user_id}'
+
+
+def chat_list_key(user_id):
+    # Версия вытеснена из кэша — заводим новую уникальную: под прежним счётчиком
+    # ещё может лежать устаревший список
+    version = cache.get_or_set(_version_key(user_id), lambda: uuid.uuid4().hex, None)
+    return f'chat:list:{user_id}:{version}'
+
+
+def bump_chat_list_version(*user_ids):
+    """Новая версия списка: старый список больше не будет найден по ключу."""
+    cache.set_many({_version_key(user_id): uuid.uuid4().hex for user_id in user_ids}, None)
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 09:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['chat_room', 'is_read', 'sender'], name='chat_message_unread_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 09:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_message_unread_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['chat_room', 'id'], name='chat_message_room_id_idx'),
+        ),
+    ]
@@ -55,6 +55,12 @@ class Message(models.Model):
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            # Подсчёт непрочитанных от собеседника в списке чатов
+            models.Index(fields=['chat_room', 'is_read', 'sender'], name='chat_message_unread_idx'),
+            # Сообщения комнаты после известного id (поток событий, chat_messages_since)
+            models.Index(fields=['chat_room', 'id'], name='chat_message_room_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.sender}: {self.content[:50]}..."
\ No newline at end of file
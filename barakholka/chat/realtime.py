@@ -0,0 +1,104 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from functools import cache
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+class InProcessBroker:
+    """
+    Рассылка событий подписчикам внутри одного процесса. Подходит, когда
+    чат обслуживает один ASGI-процесс; для нескольких узлов в CHAT_BROKER
+    указывается брокер с тем же интерфейсом (publish/subscribe) поверх
+    Redis pub/sub или PostgreSQL LISTEN/NOTIFY.
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, event):
+        """Можно вызывать из синхронного кода в любом потоке."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # Цикл событий подписчика уже закрыт — он вот-вот отпишется
+                pass
+
+    def subscribe(self, channel):
+        """async with broker.subscribe(channel) as queue — в очередь приходят события канала."""
+        return _Subscription(self, channel)
+
+    def _add(self, channel, subscriber):
+        with self._lock:
+            self._subscribers[channel].add(subscriber)
+
+    def _remove(self, channel, subscriber):
+        with self._lock:
+            self._subscribers[channel].discard(subscriber)
+            if not self._subscribers[channel]:
+                del self._subscribers[channel]
+
+
+class _Subscription:
+    # Обычный класс, а не @asynccontextmanager: брошенный поток SSE закрывает
+    # сборщик мусора, и вложенный генератор контекста падает с RuntimeError
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+
+    async def __aenter__(self):
+        self.subscriber = (asyncio.get_running_loop(), asyncio.Queue())
+        self.broker._add(self.channel, self.subscriber)
+        return self.subscriber[1]
+
+    async def __aexit__(self, *exc_info):
+        self.broker._remove(self.channel, self.subscriber)
+
+
+@cache
+def get_broker():
+    return import_string(settings.CHAT_BROKER)()
+
+
+def room_channel(room_id):
+    return f'chat.room.{room_id}'
+
+
+def message_event(message):
+    return {
+        'type': 'message',
+        'id': message.pk,
+        'sender_id': message.sender_id,
+        'sender': message.sender.username,
+        'content': message.content,
+        'timestamp': message.timestamp,
+        'is_read': message.is_read,
+    }
+
+
+def read_event(reader_id):
+    """Все сообщения, адресованные reader_id, прочитаны."""
+    return {'type': 'read', 'reader_id': reader_id}
+
+
+def publish_room_event(room_id, event):
+    # Подписчики не должны получить событие раньше, чем данные станут видны в БД
+    transaction.on_commit(lambda: get_broker().publish(room_channel(room_id), event))
+
+
+def format_sse(event):
+    """Событие в формате text/event-stream; id сообщения позволяет дослать пропущенное."""
+    lines = [f'event: {event["type"]}']
+    if event['type'] == 'message':
+        lines.append(f'id: {event["id"]}')
+    lines.append('data: ' + json.dumps(event, cls=DjangoJSONEncoder, ensure_ascii=False))
+    return '\n'.join(lines) + '\n\n'
@@ -0,0 +1,28 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from chat.list_cache import bump_chat_list_version
+from chat.models import ChatRoom, Message
+from chat.realtime import message_event, publish_room_event
+
+
+@receiver([post_save, post_delete], sender=ChatRoom)
+def invalidate_chat_list_on_room_change(sender, instance, **kwargs):
+    bump_chat_list_version(instance.buyer_id, instance.seller_id)
+
+
+@receiver([post_save, post_delete], sender=Message)
+def invalidate_chat_list_on_message(sender, instance, **kwargs):
+    if Message.chat_room.is_cached(instance):
+        room = instance.chat_room
+        bump_chat_list_version(room.buyer_id, room.seller_id)
+        return
+    room = ChatRoom.objects.filter(pk=instance.chat_room_id).values('buyer_id', 'seller_id').first()
+    if room:
+        bump_chat_list_version(room['buyer_id'], room['seller_id'])
+
+
+@receiver(post_save, sender=Message)
+def push_new_message(sender, instance, created, **kwargs):
+    if created:
+        publish_room_event(instance.chat_room_id, message_event(instance))
@@ -1,3 +1,86 @@
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from ads.models import Ads, Category
+from chat.models import ChatRoom, Message
+from user.models import Role, User
+
+
+class ChatListQueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.role = Role.objects.create(name='Продавец')
+        cls.buyer = User.objects.create_user('buyer', password='pass', role=cls.role)
+        cls.category = Category.objects.resolve('Спорт')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.buyer)
+
+    def make_chats(self, count):
+        start = ChatRoom.objects.count()
+        for number in range(start, start + count):
+            seller = User.objects.create_user(f'seller{number}', password='pass', role=self.role)
+            ad = Ads.objects.create(
+                seller=seller,
+                title=f'Велосипед {number}',
+                price=1000,
+                address='Москва',
+                type=Ads.USED,
+                category=self.category,
+            )
+            chat = ChatRoom.objects.create(ad=ad, buyer=self.buyer, seller=seller)
+            Message.objects.create(chat_room=chat, sender=self.buyer, content='Здравствуйте')
+            Message.objects.create(chat_room=chat, sender=seller, content='Добрый день')
+            Message.objects.create(chat_room=chat, sender=seller, content='Ещё продаётся', is_read=True)
+        cache.clear()
+
+    def test_query_count_does_not_grow_with_chats(self):
+        self.make_chats(2)
+        # сессия, пользователь, список чатов
+        with self.assertNumQueries(3):
+            self.client.get(reverse('chat:chat_list'))
+
+        self.make_chats(20)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('chat:chat_list'))
+        self.assertEqual(len(response.context['chats']), 22)
+
+    def test_unread_count_includes_only_unread_from_other_participant(self):
+        self.make_chats(1)
+        response = self.client.get(reverse('chat:chat_list'))
+        self.assertEqual(response.context['chats'][0].unread_count, 1)
+        self.assertContains(response, '1 новых')
+
+
+class ChatRealtimeFallbackTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        role = Role.objects.create(name='Продавец')
+        cls.buyer = User.objects.create_user('buyer', password='pass', role=role)
+        seller = User.objects.create_user('seller', password='pass', role=role)
+        ad = Ads.objects.create(
+            seller=seller,
+            title='Велосипед',
+            price=1000,
+            address='Москва',
+            type=Ads.USED,
+            category=Category.objects.resolve('Спорт'),
+        )
+        cls.chat = ChatRoom.objects.create(ad=ad, buyer=cls.buyer, seller=seller)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.buyer)
+
+    def test_page_polls_without_waiting_under_wsgi(self):
+        response = self.client.get(reverse('chat:chat_detail', args=[self.chat.pk]))
+        self.assertNotContains(response, reverse('chat:chat_events', args=[self.chat.pk]))
+        self.assertContains(response, reverse('chat:chat_messages_since', args=[self.chat.pk]))
+        # Ожидание long-poll заняло бы поток WSGI-воркера
+        self.assertContains(response, 'timeout: 0}')
+
+    def test_event_stream_is_refused_under_wsgi(self):
+        response = self.client.get(reverse('chat:chat_events', args=[self.chat.pk]))
+        self.assertEqual(response.status_code, 204)
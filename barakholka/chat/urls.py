@@ -1,6 +1,6 @@
 from django.urls import path
-from chat.views import (chat_list, chat_detail, create_general_chat,
-                        create_chat_for_ad)
+from chat.views import (chat_list, chat_detail, chat_events, chat_mark_read,
+                        chat_messages_since, create_general_chat, create_chat_for_ad)
 
 app_name = 'chat'
 
@@ -12,4 +12,10 @@ urlpatterns = [
     path('ad/<int:ad_id>/', create_chat_for_ad, name='create_chat_for_ad'),
 
     path('<int:chat_id>/', chat_detail, name='chat_detail'),
+
+    path('<int:chat_id>/events/', chat_events, name='chat_events'),
+
+    path('<int:chat_id>/read/', chat_mark_read, name='chat_mark_read'),
+
+    path('<int:chat_id>/messages/', chat_messages_since, name='chat_messages_since'),
 ]
\ No newline at end of file
@@ -1,26 +1,60 @@
+import asyncio
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
-from django.contrib.auth.models import User
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, Q
+from barakholka.cache_utils import get_or_compute
 from ads.models import Ads
 from chat.models import ChatRoom, Message
 from chat.forms import MessageForm
+from chat.list_cache import CHAT_LIST_CACHE_TIMEOUT, bump_chat_list_version, chat_list_key
+from chat.realtime import (format_sse, get_broker, message_event, publish_room_event,
+                           read_event, room_channel)
 
 
-@login_required
-def chat_list(request):
+# Пауза перед переподключением EventSource (мс) и период пингов в простаивающем потоке (с)
+SSE_RETRY_MS = 3000
+SSE_KEEPALIVE_INTERVAL = 15
+# Сколько сообщений отдаёт chat_messages_since за раз и сколько секунд можно ждать новых
+CHAT_MESSAGES_PAGE_SIZE = 100
+CHAT_LONG_POLL_MAX_TIMEOUT = 30
+# Сколько ждёт ответа long-poll страница чата под ASGI, когда поток событий выключен
+CHAT_PAGE_POLL_TIMEOUT = 25
+# Под WSGI страница не держит запрос открытым, а опрашивает сервер раз в N секунд
+CHAT_PAGE_POLL_INTERVAL = 5
 
-    if request.user.is_staff:
-        chats = ChatRoom.objects.filter(seller=request.user, is_active=True)
+
+def _load_chat_list(user):
+    if user.is_staff:
+        chats = ChatRoom.objects.filter(seller=user, is_active=True)
+        other = 'buyer'
     else:
-        chats = ChatRoom.objects.filter(buyer=request.user, is_active=True)
+        chats = ChatRoom.objects.filter(buyer=user, is_active=True)
+        other = 'seller'
+    # Один запрос: связанные объекты через JOIN, непрочитанные от собеседника — агрегатом
+    # по индексу chat_message_unread_idx. Всё вместе попадает в кэш списка.
+    return list(
+        chats.select_related('ad', 'ad__category', 'buyer', 'seller')
+        .annotate(unread_count=Count(
+            'messages',
+            filter=Q(messages__is_read=False, messages__sender=F(other)),
+        ))
+    )
 
-    for chat in chats:
-        if request.user == chat.buyer:
-            chat.unread_count = chat.messages.filter(is_read=False, sender=chat.seller).count()
-        else:
-            chat.unread_count = chat.messages.filter(is_read=False, sender=chat.buyer).count()
 
-    return render(request, 'chat_list.html', {'chats': chats})
+@login_required
+def chat_list(request):
+    chats = get_or_compute(
+        chat_list_key(request.user.pk),
+        lambda: _load_chat_list(request.user),
+        CHAT_LIST_CACHE_TIMEOUT,
+    )
+    return render(request, 'chat/chat_list.html', {'chats': chats})
 
 
 @login_required
@@ -50,7 +84,7 @@ def create_chat_for_ad(request, ad_id):
 
 @login_required
 def create_general_chat(request):
-    seller = User.objects.filter(is_staff=True).first()
+    seller = get_user_model().objects.filter(is_staff=True).first()
 
     if not seller:
         return redirect('chat:chat_list')
@@ -71,6 +105,40 @@ def create_general_chat(request):
     return redirect('chat:chat_detail', chat_id=chat_room.id)
 
 
+def _is_ajax(request):
+    return request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+
+
+def _sse_available(request):
+    """Поток событий отдаём только под ASGI: под WSGI открытый поток занимает воркер целиком."""
+    return settings.CHAT_SSE_ENABLED and isinstance(request, ASGIRequest)
+
+
+def _realtime_context(request):
+    """
+    Как странице чата получать новые сообщения. Под WSGI ожидание long-poll
+    заняло бы поток воркера так же, как поток событий, поэтому там —
+    обычный опрос с timeout=0 раз в CHAT_PAGE_POLL_INTERVAL секунд.
+    """
+    is_asgi = isinstance(request, ASGIRequest)
+    return {
+        'use_sse': _sse_available(request),
+        'poll_timeout': CHAT_PAGE_POLL_TIMEOUT if is_asgi else 0,
+        'poll_interval_ms': CHAT_PAGE_POLL_INTERVAL * 1000,
+    }
+
+
+def _mark_read(chat_room, user):
+    """Отмечает прочитанными сообщения собеседника и сообщает об этом в комнату."""
+    other = chat_room.buyer_id if user.pk == chat_room.seller_id else chat_room.seller_id
+    marked = chat_room.messages.filter(is_read=False, sender_id=other).update(is_read=True)
+    if marked:
+        # update() не вызывает сигналы — счётчик непрочитанных в списке чатов обновляем сами
+        bump_chat_list_version(user.pk)
+        publish_room_event(chat_room.pk, read_event(user.pk))
+    return marked
+
+
 @login_required
 def chat_detail(request, chat_id):
     chat_room = get_object_or_404(ChatRoom, id=chat_id)
@@ -88,25 +156,165 @@ def chat_detail(request, chat_id):
             message.sender = request.user
             message.save()
 
+            if _is_ajax(request):
+                # Собеседнику сообщение доставит поток событий, отправителю хватит ответа
+                return JsonResponse(message_event(message), status=201)
+
             messages = chat_room.messages.all()
             context = {
                 'chat_room': chat_room,
                 'messages': messages,
                 'form': MessageForm(),
+                **_realtime_context(request),
             }
-            return render(request, 'chat_detail.html', context)
+            return render(request, 'chat/chat_detail.html', context)
+        if _is_ajax(request):
+            return JsonResponse({'errors': form.errors}, status=400)
     else:
         form = MessageForm()
 
-    if request.user == chat_room.seller:
-        chat_room.messages.filter(is_read=False, sender=chat_room.buyer).update(is_read=True)
-    else:
-        chat_room.messages.filter(is_read=False, sender=chat_room.seller).update(is_read=True)
+    _mark_read(chat_room, request.user)
 
     context = {
         'chat_room': chat_room,
         'messages': messages,
         'form': form,
+        **_realtime_context(request),
     }
 
-    return render(request, 'chat_detail.html', context)
\ No newline at end of file
+    return render(request, 'chat/chat_detail.html', context)
+
+
+@require_POST
+@login_required
+def chat_mark_read(request, chat_id):
+    """Вызывается страницей чата, когда сообщение собеседника пришло по потоку событий."""
+    chat_room = get_object_or_404(ChatRoom, id=chat_id)
+    if request.user.pk not in (chat_room.buyer_id, chat_room.seller_id):
+        return HttpResponseForbidden()
+    return JsonResponse({'marked': _mark_read(chat_room, request.user)})
+
+
+async def _aget_participant_room(request, chat_id):
+    """Комната, если пользователь — её участник (та же проверка, что в chat_detail), иначе None."""
+    chat_room = await ChatRoom.objects.filter(pk=chat_id).only('buyer_id', 'seller_id').afirst()
+    if chat_room is None:
+        raise Http404
+    user = await request.auser()
+    if user.pk not in (chat_room.buyer_id, chat_room.seller_id):
+        return None
+    return chat_room
+
+
+def _messages_after(room_id, after_id):
+    # Диапазон по индексу chat_message_room_id_idx (chat_room_id, id)
+    return (
+        Message.objects.filter(chat_room_id=room_id, id__gt=after_id)
+        .select_related('sender')
+        .order_by('id')
+    )
+
+
+@login_required
+async def chat_events(request, chat_id):
+    """
+    Поток Server-Sent Events комнаты: новые сообщения и отметки о прочтении.
+    Под WSGI или при CHAT_SSE_ENABLED = False отвечает 204 — по стандарту
+    EventSource после этого не переподключается, а страница чата
+    пользуется chat_messages_since.
+    """
+    if not _sse_available(request):
+        return HttpResponse(status=204)
+
+    chat_room = await _aget_participant_room(request, chat_id)
+    if chat_room is None:
+        return HttpResponseForbidden()
+
+    # При переподключении браузер сам присылает Last-Event-ID. Первое подключение
+    # передаёт ?after= — последнее сообщение, отрисованное на странице, чтобы
+    # не потерять сообщения между отрисовкой и подпиской
+    position = request.headers.get('Last-Event-ID') or request.GET.get('after')
+    try:
+        last_event_id = int(position) if position else None
+    except ValueError:
+        last_event_id = None
+
+    response = StreamingHttpResponse(
+        _room_event_stream(chat_room.pk, last_event_id),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Чтобы nginx не буферизовал поток
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def _room_event_stream(room_id, last_event_id):
+    yield f'retry: {SSE_RETRY_MS}\n\n'
+    async with get_broker().subscribe(room_channel(room_id)) as events:
+        # Подписка уже есть — досылаем пропущенное при переподключении, ничего не теряя между ними
+        if last_event_id is not None:
+            async for message in _messages_after(room_id, last_event_id):
+                last_event_id = message.pk
+                yield format_sse(message_event(message))
+        last_event_id = last_event_id or 0
+
+        while True:
+            try:
+                event = await asyncio.wait_for(events.get(), SSE_KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                # Комментарий не даёт прокси закрыть простаивающее соединение
+                yield ': keepalive\n\n'
+                continue
+            if event['type'] == 'message' and event['id'] <= last_event_id:
+                continue
+            yield format_sse(event)
+
+
+@login_required
+async def chat_messages_since(request, chat_id):
+    """
+    Сообщения комнаты с id больше ?after=, в JSON. С ?timeout=N при отсутствии
+    новых сообщений ждёт их до N секунд (не больше CHAT_LONG_POLL_MAX_TIMEOUT),
+    подписавшись на события комнаты, а не опрашивая БД.
+    """
+    chat_room = await _aget_participant_room(request, chat_id)
+    if chat_room is None:
+        return HttpResponseForbidden()
+
+    try:
+        after = max(int(request.GET.get('after', 0)), 0)
+        timeout = float(request.GET.get('timeout', 0))
+    except ValueError:
+        return JsonResponse({'error': 'after и timeout должны быть числами'}, status=400)
+    # Заодно отсекает отрицательные значения и nan
+    timeout = min(timeout, CHAT_LONG_POLL_MAX_TIMEOUT) if timeout > 0 else 0
+
+    async def fetch():
+        return [
+            message_event(message)
+            async for message in _messages_after(chat_room.pk, after)[:CHAT_MESSAGES_PAGE_SIZE + 1]
+        ]
+
+    # Подписываемся до запроса к БД, чтобы не пропустить сообщение, пришедшее между ними
+    async with get_broker().subscribe(room_channel(chat_room.pk)) as events:
+        messages = await fetch()
+        deadline = asyncio.get_running_loop().time() + timeout
+        while not messages:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                event = await asyncio.wait_for(events.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            if event['type'] == 'message' and event['id'] > after:
+                messages = await fetch()
+
+    has_more = len(messages) > CHAT_MESSAGES_PAGE_SIZE
+    messages = messages[:CHAT_MESSAGES_PAGE_SIZE]
+    return JsonResponse({
+        'messages': messages,
+        'last_id': messages[-1]['id'] if messages else after,
+        'has_more': has_more,
+    })